@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import crear_backend_sin_interfaz, configuracion_desde_entorno
+from archivo_historial import leer_resumen, RUTA_ARCHIVO
+from catalogo import CatalogoPersistente
+from datos_stock import nuevo_cache_sincronizacion, sincronizar_datos, calcular_reporte_stock
+
+# Evaluador de alertas de stock bajo, sin interfaz. Carga los movimientos con la
+# misma sincronización que la app, arma el reporte de todo el catálogo y compara
+# los días restantes contra umbrales configurables. El resultado queda en un JSON
+# que la app lee (así el pronóstico no se calcula en cada rerun) y se puede
+# comparar con la corrida anterior: alertas nuevas, resueltas y que siguen.
+#
+# Umbrales (umbrales_alertas.json), del más específico al más general:
+#   {"por_material": {"KYD 6200K": 10},     código o descripción
+#    "por_planta":   {"Combet 2": 20},
+#    "por_tipo":     {"MATERIA PRIMA": 15, "INSUMO": 30}}
+#
+# Uso: python alertas.py [--umbrales umbrales_alertas.json] [--salida alertas_estado.json]
+#                        [--cola alertas_eventos.jsonl] [--cada MINUTOS]
+
+RUTA_UMBRALES = "umbrales_alertas.json"
+RUTA_ESTADO = "alertas_estado.json"
+UMBRALES_POR_DEFECTO = {
+    "por_material": {},
+    "por_planta": {},
+    "por_tipo": {"MATERIA PRIMA": 15, "INSUMO": 30},
+}
+COLUMNAS_TABLA = ['Código', 'Descripción', 'Planta', 'Días Restantes', 'Umbral', 'Unidad', 'Activa desde']
+
+_JSON_LEIDOS = {}  # ruta -> (fecha de modificación, contenido)
+
+
+def _leer_json(ruta):
+    # Releído sólo si el archivo cambió; None si no existe
+    try:
+        firma = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    guardado = _JSON_LEIDOS.get(ruta)
+    if guardado is None or guardado[0] != firma:
+        with open(ruta, encoding='utf-8') as f:
+            guardado = (firma, json.load(f))
+        _JSON_LEIDOS[ruta] = guardado
+    return guardado[1]
+
+
+def _escribir_json(ruta, contenido):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def cargar_umbrales(ruta=RUTA_UMBRALES):
+    umbrales = {clave: dict(valor) for clave, valor in UMBRALES_POR_DEFECTO.items()}
+    for clave, valor in (_leer_json(ruta) or {}).items():
+        umbrales.setdefault(clave, {}).update(valor)
+    return umbrales
+
+
+def umbral_para(codigo, descripcion, planta, tipo, umbrales):
+    por_material = umbrales["por_material"]
+    for clave in (codigo, descripcion):
+        if clave in por_material:
+            return float(por_material[clave])
+    if planta in umbrales["por_planta"]:
+        return float(umbrales["por_planta"][planta])
+    return float(umbrales["por_tipo"].get(tipo, 0))
+
+
+def evaluar_alertas(df_reporte, catalogo, umbrales):
+    # df_reporte sale de calcular_reporte_stock(…, catalogo): una fila por fila del catálogo.
+    # Se toman código y planta del catálogo (no del reporte), así cada código tiene su alerta.
+    # -> lista de alertas activas (dicts)
+    alertas = []
+    dias = df_reporte['Días Restantes'].to_numpy(dtype=float)
+    for i, fila in enumerate(catalogo[['codigo', 'descripcion', 'planta', 'tipo', 'unidad']].itertuples(index=False)):
+        if not np.isfinite(dias[i]):
+            continue  # Sin consumo: no hay pronóstico
+        umbral = umbral_para(fila.codigo, fila.descripcion, fila.planta, fila.tipo, umbrales)
+        if dias[i] <= umbral:
+            alertas.append({
+                'codigo': fila.codigo,
+                'descripcion': fila.descripcion,
+                'planta': fila.planta,
+                'tipo': fila.tipo,
+                'unidad': fila.unidad,
+                'dias_restantes': round(float(dias[i]), 2),
+                'umbral': umbral,
+                'ultimo_stock': float(df_reporte['Último Stock'].iloc[i]),
+                'fecha_agotamiento': df_reporte['Fecha Agotamiento'].iloc[i],
+            })
+    return alertas
+
+
+def comparar_alertas(previo, alertas, momento):
+    # -> estado nuevo con las listas nuevas / resueltas / siguen (por código)
+    anteriores = {a['codigo']: a for a in (previo or {}).get('activas', [])}
+    actuales = {a['codigo'] for a in alertas}
+    for alerta in alertas:
+        alerta['desde'] = anteriores.get(alerta['codigo'], {}).get('desde', momento)
+    return {
+        'evaluado_en': momento,
+        'activas': alertas,
+        'nuevas': sorted(actuales - anteriores.keys()),
+        'resueltas': sorted(anteriores.keys() - actuales),
+        'siguen': sorted(actuales & anteriores.keys()),
+    }
+
+
+def leer_estado_alertas(ruta=RUTA_ESTADO):
+    return _leer_json(ruta)
+
+
+def tabla_alertas(alertas, tipo=None):
+    filas = [a for a in alertas if tipo is None or a['tipo'] == tipo]
+    return pd.DataFrame([{
+        'Código': a['codigo'],
+        'Descripción': a['descripcion'],
+        'Planta': a['planta'],
+        'Días Restantes': a['dias_restantes'],
+        'Umbral': a['umbral'],
+        'Unidad': a['unidad'],
+        'Activa desde': a.get('desde', ''),
+    } for a in filas], columns=COLUMNAS_TABLA)
+
+
+def evaluar(backend, cache, catalogo, umbrales, ruta_estado=RUTA_ESTADO, ruta_cola=None, ahora=None):
+    ahora = ahora or datetime.now()
+    cache["df"] = sincronizar_datos(backend, cache)
+    reporte = calcular_reporte_stock(cache["df"], catalogo.df, ahora,
+                                     indice=catalogo.por_descripcion, foto=cache["foto_stock"])
+    alertas = evaluar_alertas(reporte, catalogo.df, umbrales)
+    estado = comparar_alertas(leer_estado_alertas(ruta_estado), alertas, ahora.isoformat(timespec='seconds'))
+    estado['materiales_evaluados'] = len(catalogo)
+    estado['umbrales'] = umbrales
+    _escribir_json(ruta_estado, estado)
+
+    if ruta_cola:
+        # Un evento por cambio, para quien quiera avisar por otro canal
+        por_codigo = {a['codigo']: a for a in alertas}
+        with open(ruta_cola, 'a', encoding='utf-8') as f:
+            for codigo in estado['nuevas']:
+                f.write(json.dumps({'evento': 'nueva', 'momento': estado['evaluado_en'], **por_codigo[codigo]},
+                                   ensure_ascii=False) + "\n")
+            for codigo in estado['resueltas']:
+                f.write(json.dumps({'evento': 'resuelta', 'momento': estado['evaluado_en'], 'codigo': codigo},
+                                   ensure_ascii=False) + "\n")
+    return estado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evalúa las alertas de stock bajo")
+    parser.add_argument("--umbrales", default=None)
+    parser.add_argument("--salida", default=None)
+    parser.add_argument("--cola", default=None, help="archivo JSONL donde agregar los cambios")
+    parser.add_argument("--cada", type=float, default=0, help="repetir cada N minutos (0 = una sola vez)")
+    args = parser.parse_args()
+
+    config = configuracion_desde_entorno()
+    backend = crear_backend_sin_interfaz(config)
+    persistente = CatalogoPersistente(config.get("catalogo_ruta", "catalogo_materiales.csv"))
+    ruta_archivo = config.get("archivo_ruta", RUTA_ARCHIVO)
+    ruta_umbrales = args.umbrales or config.get("alertas_umbrales", RUTA_UMBRALES)
+    ruta_estado = args.salida or config.get("alertas_ruta", RUTA_ESTADO)
+
+    # El mismo cache entre corridas: después de la primera, la lectura es incremental
+    cache = nuevo_cache_sincronizacion()
+    while True:
+        resumen = leer_resumen(ruta_archivo)
+        if resumen is not cache["resumen_archivo"]:
+            cache["resumen_archivo"] = resumen
+            cache["encabezados"] = None
+        try:
+            estado = evaluar(backend, cache, persistente.actual(), cargar_umbrales(ruta_umbrales),
+                             ruta_estado, args.cola)
+            print(f"{estado['evaluado_en']}: {len(estado['activas'])} alertas activas "
+                  f"({len(estado['nuevas'])} nuevas, {len(estado['resueltas'])} resueltas)")
+        except Exception as e:
+            if not args.cada:
+                raise
+            # Programado: un corte de red no termina el proceso, se reintenta en la próxima vuelta
+            print(f"Error al evaluar las alertas: {e}", file=sys.stderr)
+        if not args.cada:
+            break
+        time.sleep(args.cada * 60)
@@ -0,0 +1,350 @@
+import os
+import sqlite3
+import threading
+import time
+
+from instrumentacion import INSTRUMENTACION, tramo
+
+# Backends de almacenamiento de movimientos. Todos devuelven filas crudas
+# (listas de strings, como get_all_values) para que la limpieza sea la misma
+# sin importar de dónde vengan los datos. gspread (y con él google.auth) se
+# importa recién cuando se usa Google Sheets: arrancar con SQLite no lo carga.
+
+NOMBRE_BASE_DATOS = "Base de Datos Fábrica"
+ENCABEZADOS_DB = ['material_codigo', 'fecha_hora', 'cantidad', 'planta', 'id_movimiento']
+COLUMNA_ID = 'id_movimiento'
+
+
+def _completar_fila(fila, ancho):
+    # La API recorta las celdas vacías al final de cada fila; las rellenamos
+    # para que coincidan con lo que devuelve get_all_values()
+    fila = list(fila)
+    if len(fila) < ancho:
+        fila += [''] * (ancho - len(fila))
+    return fila[:ancho]
+
+
+def _sin_vacias_al_final(fila):
+    fila = list(fila)
+    while fila and fila[-1] == '':
+        fila.pop()
+    return fila
+
+
+class BackendAlmacenamiento:
+    # Interfaz común. Las posiciones de fila empiezan en 0 (primera fila de datos).
+    nombre = "base"
+
+    def cargar_todo(self):
+        # -> (encabezados, filas)
+        raise NotImplementedError
+
+    def cargar_desde(self, desde, ultima_fila=None):
+        # Filas a partir de la posición `desde`. `ultima_fila` es la fila que el
+        # llamador ya tiene en la posición desde-1, para detectar borrados/ediciones.
+        # -> (encabezados, filas nuevas), o None si hace falta releer todo
+        raise NotImplementedError
+
+    def agregar_lote(self, filas):
+        raise NotImplementedError
+
+    def ultimas(self, n, total=None):
+        # -> (encabezados, últimas n filas). `total` es la cantidad de filas de datos
+        # ya conocida (p. ej. de la última sincronización), para no tener que contarlas.
+        raise NotImplementedError
+
+    def compactar(self, conservar, total):
+        # Deja sólo las filas en las posiciones `conservar` (en orden), de una lectura
+        # que tenía `total` filas; lo agregado después de esa lectura se mantiene.
+        raise NotImplementedError
+
+    def reiniciar(self):
+        # Descarta conexiones/hojas abiertas después de un error
+        pass
+
+    def preparar(self):
+        # Abre lo necesario antes del primer pedido (se llama desde el hilo de conexión)
+        pass
+
+
+class BackendGoogleSheets(BackendAlmacenamiento):
+    nombre = "Google Sheets"
+
+    def __init__(self, client, nombre_hoja=NOMBRE_BASE_DATOS):
+        self.client = client
+        self.nombre_hoja = nombre_hoja
+        self._hoja = None
+
+    @property
+    def hoja(self):
+        # client.open cuesta dos pedidos (Drive + metadata): lo hacemos una sola vez
+        if self._hoja is None:
+            with tramo("abrir_hoja"):
+                self._hoja = self.client.open(self.nombre_hoja).sheet1
+        return self._hoja
+
+    def reiniciar(self):
+        self._hoja = None
+
+    def preparar(self):
+        self.hoja
+
+    def cargar_todo(self):
+        data = self.hoja.get_all_values()
+        if not data:
+            return [], []
+        return data[0], data[1:]
+
+    def cargar_desde(self, desde, ultima_fila=None):
+        from gspread.utils import rowcol_to_a1
+
+        ancho = len(ultima_fila) if ultima_fila else 26
+        col_fin = rowcol_to_a1(1, ancho).rstrip('0123456789')
+
+        # En un solo pedido traemos el encabezado y la cola de la hoja, empezando por
+        # la última fila ya ingerida (fila desde + 1, contando el encabezado)
+        # para confirmar que nadie borró ni editó filas.
+        primera = desde + 1 if desde > 0 else 2
+        encabezado, cola = self.hoja.batch_get(["1:1", f"A{primera}:{col_fin}"])
+        encabezado = encabezado[0] if encabezado else []
+
+        cola = [_completar_fila(f, ancho) for f in cola]
+        if desde > 0:
+            if not cola or cola[0] != _completar_fila(ultima_fila, ancho):
+                return None
+            cola = cola[1:]
+        return encabezado, cola
+
+    def agregar_lote(self, filas):
+        hoja = self.hoja
+        # El encabezado se verifica una sola vez y viaja en el mismo pedido
+        encabezado = _sin_vacias_al_final(hoja.row_values(1))
+        if not encabezado:
+            filas = [ENCABEZADOS_DB] + list(filas)
+        elif COLUMNA_ID not in [c.lower().strip() for c in encabezado]:
+            # Hoja anterior a los ids: agregamos la columna una única vez
+            from gspread.utils import rowcol_to_a1
+
+            hoja.update_acell(rowcol_to_a1(1, len(encabezado) + 1), COLUMNA_ID)
+        hoja.append_rows(filas)
+
+    def ultimas(self, n, total=None):
+        if total is None:
+            total = len(self.hoja.col_values(1)) - 1
+        # Rango abierto al final: si se agregaron filas desde que se contó, también vienen
+        primera = max(2, total - n + 2)
+        encabezado, cola = self.hoja.batch_get(["1:1", f"A{primera}:Z"])
+        encabezado = encabezado[0] if encabezado else []
+        cola = cola[-n:] if n > 0 else []
+        return encabezado, [_completar_fila(f, len(encabezado)) for f in cola]
+
+    def compactar(self, conservar, total):
+        encabezado, filas = self.cargar_todo()
+        quedan = [filas[i] for i in conservar] + filas[total:]
+        # Dos pedidos: se pisan las primeras filas y se borra el sobrante del final.
+        # RAW deja el texto tal cual se leyó, así la limpieza lo interpreta igual que antes.
+        if quedan:
+            self.hoja.update(values=[_completar_fila(f, len(encabezado)) for f in quedan],
+                             range_name="A2", value_input_option="RAW")
+        if len(filas) > len(quedan):
+            self.hoja.delete_rows(len(quedan) + 2, len(filas) + 1)
+
+
+class BackendSQLite(BackendAlmacenamiento):
+    # Base local para plantas con mala conexión y para correr todo sin Google.
+    # Se guardan los valores como texto, igual que en la hoja, y el id
+    # autoincremental coincide con la posición de fila + 1.
+    nombre = "SQLite"
+    COLUMNAS = "material_codigo, fecha_hora, cantidad, planta, id_movimiento"
+
+    def __init__(self, ruta="control_stock.db"):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(ruta, check_same_thread=False)
+        with self._lock, self._con:
+            self._con.execute(
+                "CREATE TABLE IF NOT EXISTS movimientos ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " material_codigo TEXT, fecha_hora TEXT, cantidad TEXT, planta TEXT,"
+                " id_movimiento TEXT NOT NULL DEFAULT '')"
+            )
+            columnas = {f[1] for f in self._con.execute("PRAGMA table_info(movimientos)")}
+            if COLUMNA_ID not in columnas:
+                self._con.execute("ALTER TABLE movimientos ADD COLUMN id_movimiento TEXT NOT NULL DEFAULT ''")
+            self._con.execute(
+                "CREATE INDEX IF NOT EXISTS idx_movimientos_material_fecha"
+                " ON movimientos (material_codigo, fecha_hora)"
+            )
+            # Respaldo de la deduplicación de la app: un id nunca se inserta dos veces
+            self._con.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_movimientos_id"
+                " ON movimientos (id_movimiento) WHERE id_movimiento <> ''"
+            )
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            return [list(f) for f in self._con.execute(sql, parametros).fetchall()]
+
+    def cargar_todo(self):
+        filas = self._consultar(
+            f"SELECT {self.COLUMNAS} FROM movimientos ORDER BY id"
+        )
+        return list(ENCABEZADOS_DB), filas
+
+    def cargar_desde(self, desde, ultima_fila=None):
+        if desde > 0:
+            control = self._consultar(
+                f"SELECT {self.COLUMNAS} FROM movimientos WHERE id = ?",
+                (desde,),
+            )
+            if not control or control[0] != _completar_fila(ultima_fila or [], len(ENCABEZADOS_DB)):
+                return None
+        filas = self._consultar(
+            f"SELECT {self.COLUMNAS} FROM movimientos WHERE id > ? ORDER BY id",
+            (desde,),
+        )
+        return list(ENCABEZADOS_DB), filas
+
+    def agregar_lote(self, filas):
+        filas = [[str(v) for v in _completar_fila(f, len(ENCABEZADOS_DB))] for f in filas]
+        with self._lock, self._con:
+            # Los ids ya guardados se filtran antes de insertar: un INSERT OR IGNORE
+            # gastaría el autoincremental y el id dejaría de ser la posición + 1
+            ids = list({f[4] for f in filas if f[4]})
+            existentes = set()
+            for i in range(0, len(ids), 500):
+                parte = ids[i:i + 500]
+                existentes.update(v for (v,) in self._con.execute(
+                    f"SELECT id_movimiento FROM movimientos WHERE id_movimiento IN ({', '.join('?' * len(parte))})",
+                    parte,
+                ))
+            nuevas = []
+            for fila in filas:
+                if fila[4] and fila[4] in existentes:
+                    continue
+                existentes.add(fila[4])
+                nuevas.append(fila)
+            self._con.executemany(
+                f"INSERT INTO movimientos ({self.COLUMNAS}) VALUES (?, ?, ?, ?, ?)", nuevas
+            )
+
+    def ultimas(self, n, total=None):
+        filas = self._consultar(
+            f"SELECT {self.COLUMNAS} FROM"
+            " (SELECT * FROM movimientos ORDER BY id DESC LIMIT ?) ORDER BY id",
+            (n,),
+        )
+        return list(ENCABEZADOS_DB), filas
+
+    def compactar(self, conservar, total):
+        with self._lock, self._con:
+            filas = self._con.execute(f"SELECT {self.COLUMNAS} FROM movimientos ORDER BY id").fetchall()
+            quedan = [filas[i] for i in conservar] + filas[total:]
+            # Se reinicia el autoincremental para que el id siga siendo la posición + 1
+            self._con.execute("DELETE FROM movimientos")
+            self._con.execute("DELETE FROM sqlite_sequence WHERE name = 'movimientos'")
+            self._con.executemany(
+                f"INSERT INTO movimientos ({self.COLUMNAS}) VALUES (?, ?, ?, ?, ?)", quedan
+            )
+        with self._lock:
+            self._con.execute("VACUUM")
+
+
+def crear_backend(config, client=None):
+    # config: {"backend": "gsheets" | "sqlite", "sqlite_ruta": ..., "nombre_hoja": ...}
+    tipo = str(config.get("backend", "gsheets")).lower()
+    if tipo == "sqlite":
+        return BackendSQLite(config.get("sqlite_ruta", "control_stock.db"))
+    if tipo == "gsheets":
+        return BackendGoogleSheets(client, config.get("nombre_hoja", NOMBRE_BASE_DATOS))
+    raise ValueError(f"Backend de almacenamiento desconocido: {tipo}")
+
+
+class ConexionEnSegundoPlano:
+    # Crea el backend en un hilo aparte (importar google.auth, autorizar, abrir la
+    # hoja) mientras la interfaz ya se dibuja. `crear` no debe usar streamlit.
+    # Los tramos y pedidos de la conexión se juntan en `mediciones` y se suman al
+    # primer rerun que la espera con obtener(), así aparecen en "Este rerun".
+    def __init__(self, crear):
+        self.backend = None
+        self.error = None
+        self.segundos = None
+        self.mediciones = None
+        self._sumadas = False
+        self._lock = threading.Lock()
+        self._lista = threading.Event()
+        self._hilo = threading.Thread(target=self._conectar, args=(crear,), name="conexion-backend", daemon=True)
+        self._hilo.start()
+
+    def _conectar(self, crear):
+        inicio = time.perf_counter()
+        self.mediciones = INSTRUMENTACION.iniciar_rerun()
+        try:
+            with tramo("conexion_backend"):
+                self.backend = crear()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.segundos = time.perf_counter() - inicio
+            self._lista.set()
+
+    @property
+    def lista(self):
+        return self._lista.is_set()
+
+    def obtener(self, timeout=None):
+        # Espera a que termine; si falló, el error sale acá, en el hilo de la página
+        if not self._lista.wait(timeout):
+            raise TimeoutError("La conexión con el almacenamiento sigue en curso")
+        with self._lock:
+            sumar, self._sumadas = not self._sumadas, True
+        if sumar:
+            INSTRUMENTACION.sumar_al_rerun(self.mediciones)
+        if self.error is not None:
+            raise self.error
+        return self.backend
+
+
+def crear_backend_sin_interfaz(config):
+    # Para los procesos sin Streamlit (archivado, alertas): credenciales desde
+    # service_account.json, con el mismo cliente limitado que usa la app
+    if str(config.get("backend", "gsheets")).lower() == "sqlite":
+        return crear_backend(config)
+    import gspread
+    from google.oauth2 import service_account
+    from cliente_sheets import ClienteSheetsLimitado
+
+    scopes = ["https://www.googleapis.com/auth/spreadsheets",
+              "https://www.googleapis.com/auth/drive"]
+    creds = service_account.Credentials.from_service_account_file("service_account.json", scopes=scopes)
+    return crear_backend(config, ClienteSheetsLimitado(gspread.authorize(creds)))
+
+
+def configuracion_desde_entorno():
+    # Variables de entorno: STOCK_BACKEND, STOCK_SQLITE_PATH, STOCK_NOMBRE_HOJA, STOCK_JOURNAL_PATH,
+    # STOCK_CATALOGO_PATH, STOCK_ARCHIVO_PATH, STOCK_METRICAS_LOG,
+    # STOCK_ALERTAS_UMBRALES, STOCK_ALERTAS_PATH, STOCK_ALERTAS_VIGENCIA_MINUTOS, STOCK_FOTO_PATH
+    config = {}
+    if os.environ.get("STOCK_BACKEND"):
+        config["backend"] = os.environ["STOCK_BACKEND"]
+    if os.environ.get("STOCK_SQLITE_PATH"):
+        config["sqlite_ruta"] = os.environ["STOCK_SQLITE_PATH"]
+    if os.environ.get("STOCK_NOMBRE_HOJA"):
+        config["nombre_hoja"] = os.environ["STOCK_NOMBRE_HOJA"]
+    if os.environ.get("STOCK_JOURNAL_PATH"):
+        config["journal_ruta"] = os.environ["STOCK_JOURNAL_PATH"]
+    if os.environ.get("STOCK_CATALOGO_PATH"):
+        config["catalogo_ruta"] = os.environ["STOCK_CATALOGO_PATH"]
+    if os.environ.get("STOCK_ARCHIVO_PATH"):
+        config["archivo_ruta"] = os.environ["STOCK_ARCHIVO_PATH"]
+    if os.environ.get("STOCK_METRICAS_LOG"):
+        config["metricas_log"] = os.environ["STOCK_METRICAS_LOG"]
+    if os.environ.get("STOCK_ALERTAS_UMBRALES"):
+        config["alertas_umbrales"] = os.environ["STOCK_ALERTAS_UMBRALES"]
+    if os.environ.get("STOCK_ALERTAS_PATH"):
+        config["alertas_ruta"] = os.environ["STOCK_ALERTAS_PATH"]
+    if os.environ.get("STOCK_ALERTAS_VIGENCIA_MINUTOS"):
+        config["alertas_vigencia_minutos"] = float(os.environ["STOCK_ALERTAS_VIGENCIA_MINUTOS"])
+    if os.environ.get("STOCK_FOTO_PATH"):
+        config["foto_ruta"] = os.environ["STOCK_FOTO_PATH"]
+    return config
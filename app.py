@@ -2,245 +2,360 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import numpy as np
-import gspread
-from google.oauth2.credentials import Credentials
-from google.oauth2 import service_account
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 import os
 import time
 import json
+import threading
+import io
+import uuid
+
+from almacenamiento import crear_backend, configuracion_desde_entorno, ConexionEnSegundoPlano
+from cliente_sheets import ClienteSheetsLimitado
+from cola_escritura import ColaEscritura
+from catalogo import CatalogoPersistente
+from archivo_historial import leer_resumen, firma_archivo, cargar_archivo
+from alertas import leer_estado_alertas, evaluar_alertas, cargar_umbrales, tabla_alertas
+from instrumentacion import INSTRUMENTACION, tramo, marca
+from importacion import importar_conteo
+from datos_stock import (
+    sincronizar_datos,
+    encolar_lote,
+    calcular_reporte_stock,
+    movimientos_recientes,
+    guardar_foto_stock,
+    leer_foto_stock,
+)
 
 # --- Configuración de la Página ---
 st.set_page_config(layout="wide", page_title="Control de Stock")
 st.title('Sistema de Control de Stock con Google Sheets')
 
+# Tramos y contadores de este rerun (ver instrumentacion.py y el panel de Rendimiento)
+INSTRUMENTACION.iniciar_rerun()
+
 # --- Conexión a Google Sheets ---
-@st.cache_resource
-def conectar_google_client():
+# Las credenciales se buscan desde la página (pueden venir de st.secrets), pero la
+# autorización corre en el hilo de conexión: gspread y google.auth se importan
+# recién ahí, mientras la página ya muestra el catálogo.
+def credenciales_google():
+    if os.path.exists("service_account.json"):
+        return {"archivo": "service_account.json"}
+    if "gcp_service_account" in st.secrets:
+        return {"info": json.loads(st.secrets["gcp_service_account"]["service_account_json"])}
+    st.error("❌ No se encontraron credenciales de cuenta de servicio.")
+    st.stop()
+
+def conectar_google_client(credenciales):
+    import gspread
+    from google.oauth2 import service_account
+
     SCOPES = ["https://www.googleapis.com/auth/spreadsheets",
               "https://www.googleapis.com/auth/drive"]
 
-    creds = None
-
-    if os.path.exists("service_account.json"):
-        creds = service_account.Credentials.from_service_account_file(
-            "service_account.json", scopes=SCOPES
-        )
-    elif "gcp_service_account" in st.secrets:
-        service_info = json.loads(st.secrets["gcp_service_account"]["service_account_json"])
-        creds = service_account.Credentials.from_service_account_info(
-            service_info, scopes=SCOPES
-        )
-    else:
-        st.error("❌ No se encontraron credenciales de cuenta de servicio.")
-        st.stop()
+    with tramo("credenciales"):
+        if "archivo" in credenciales:
+            creds = service_account.Credentials.from_service_account_file(
+                credenciales["archivo"], scopes=SCOPES
+            )
+        else:
+            creds = service_account.Credentials.from_service_account_info(
+                credenciales["info"], scopes=SCOPES
+            )
 
-    client = gspread.authorize(creds)
+        client = gspread.authorize(creds)
     # st.success("Cliente Google Autorizado ✅") # Comentado para limpiar interfaz
     return client
 
-def cargar_y_procesar_datos(client):
-    if client is None:
-        return pd.DataFrame()
+# --- Almacenamiento ---
+# Se elige con la variable de entorno STOCK_BACKEND ("gsheets" o "sqlite") o con
+# la sección [almacenamiento] de los secrets. Por defecto: Google Sheets.
+# Cada clave se pisa en orden: valores por defecto, secrets y variables STOCK_*.
+def configuracion_almacenamiento():
+    config = {"backend": "gsheets", "sqlite_ruta": "control_stock.db", "journal_ruta": "cola_movimientos.jsonl",
+              "catalogo_ruta": "catalogo_materiales.csv", "archivo_ruta": "archivo_historial",
+              "alertas_umbrales": "umbrales_alertas.json", "alertas_ruta": "alertas_estado.json",
+              "alertas_vigencia_minutos": 120, "foto_ruta": "foto_stock.csv"}
+    try:
+        if "almacenamiento" in st.secrets:
+            config.update(dict(st.secrets["almacenamiento"]))
+    except Exception:
+        pass  # Sin secrets.toml: usamos los valores por defecto
+    config.update(configuracion_desde_entorno())
+    return config
+
+PEDIDOS_POR_MINUTO_SHEETS = 60  # Cuota de lectura de la API de Sheets por usuario
+
+# Una conexión por proceso, arrancada en segundo plano en el primer rerun.
+# iniciar_conexion() vuelve enseguida; obtener_backend() espera a que termine.
+@st.cache_resource
+def iniciar_conexion():
+    config = configuracion_almacenamiento()
+    if str(config["backend"]).lower() == "sqlite":
+        return ConexionEnSegundoPlano(lambda: crear_backend(config))
+    credenciales = credenciales_google()
+
+    def conectar():
+        # Un único cliente limitado por proceso: todas las sesiones comparten la cuota
+        client = ClienteSheetsLimitado(conectar_google_client(credenciales), pedidos_por_minuto=PEDIDOS_POR_MINUTO_SHEETS)
+        backend = crear_backend(config, client)
+        try:
+            backend.preparar()
+        except Exception:
+            backend.reiniciar()  # La primera lectura reintenta y muestra el error
+        return backend
+    return ConexionEnSegundoPlano(conectar)
 
+def obtener_backend():
     try:
-        sheet = client.open("Base de Datos Fábrica").sheet1
-        data = sheet.get_all_values()
-        
-        if not data:
-            return pd.DataFrame()
-            
-        headers = data.pop(0)
-        df = pd.DataFrame(data, columns=headers)
-    except Exception as e:
-        st.warning(f"Error al leer Google Sheets: {e}")
+        return iniciar_conexion().obtener()
+    except Exception:
+        # Una conexión fallida no queda guardada: el próximo rerun la reintenta
+        iniciar_conexion.clear()
+        raise
+
+# --- Caché de Datos Compartida ---
+# Un único DataFrame limpio por proceso, compartido por todas las sesiones.
+# Se invalida explícitamente después de guardar, sin tirar el cliente autorizado.
+# La hoja es de sólo-agregado: en cada vencimiento del TTL traemos únicamente
+# las filas nuevas y las unimos al DataFrame ya procesado.
+CACHE_TTL_SEGUNDOS = 300
+
+@st.cache_resource
+def obtener_cache_datos():
+    return {
+        "df": None,
+        "cargado_en": 0.0,
+        "version": 0,
+        "hits": 0,
+        "misses": 0,
+        "encabezados": None,
+        "filas_ingeridas": 0,
+        "ultima_fila_cruda": None,
+        "resync_en": 0.0,
+        "resyncs": 0,
+        "filas_incrementales": 0,
+        "ids_vistos": set(),
+        "duplicados_descartados": 0,
+        "memoria_compacta": 0,
+        "lectura": {},
+        "foto_stock": None,
+        "foto_actualizados": 0,
+        "resumen_archivo": None,
+        "foto_guardada": None,
+        "lock": threading.Lock(),
+    }
+
+def obtener_datos_stock(backend, ttl=CACHE_TTL_SEGUNDOS):
+    if backend is None:
         return pd.DataFrame()
 
-    # Normalizamos columnas
-    df.columns = [c.lower().strip() for c in df.columns]
-    required_cols_db = ['fecha_hora', 'cantidad', 'material_codigo']
-    
-    if not df.empty and all(col in df.columns for col in required_cols_db):
-        # Guardamos una copia para debug
-        filas_totales = len(df)
-        
-        # 1. Limpieza de Fechas: Intentamos formato ISO primero, luego día/mes
-        df['fecha_hora'] = pd.to_datetime(df['fecha_hora'], format='mixed', dayfirst=True, errors='coerce')
-        
-        # 2. Limpieza Cantidad
-        df['cantidad'] = df['cantidad'].astype(str).str.replace(',', '.', regex=False)
-        df['cantidad'] = pd.to_numeric(df['cantidad'], errors='coerce')
-        
-        if 'planta' not in df.columns:
-            df['planta'] = 'N/A'
-            
-        # 3. Eliminar nulos
-        df_clean = df.dropna(subset=['fecha_hora', 'cantidad', 'material_codigo']).copy()
-        
-        # DEBUG: Si se borraron filas, avisar (puede ser útil verlo en consola)
-        filas_borradas = filas_totales - len(df_clean)
-        if filas_borradas > 0:
-            print(f"⚠️ OJO: Se descartaron {filas_borradas} filas por formato incorrecto.")
-            
-        # 4. Ordenar
-        df_clean = df_clean.sort_values(by='fecha_hora', ascending=True)
-        return df_clean
-        
-    return df
+    cache = obtener_cache_datos()
+    # El lock evita que varias sesiones descarguen la hoja al mismo tiempo
+    with cache["lock"]:
+        if cache["df"] is not None and (time.time() - cache["cargado_en"]) < ttl:
+            cache["hits"] += 1
+            return cache["df"]
 
-def guardar_dato_gsheet(client, nuevo_dato):
-    if client is None:
-        return False
+        cache["misses"] += 1
+        try:
+            # Si se archivó historia desde la última carga, la hoja cambió: se relee todo
+            resumen = leer_resumen(configuracion_almacenamiento()["archivo_ruta"])
+            if resumen is not cache["resumen_archivo"]:
+                cache["resumen_archivo"] = resumen
+                cache["encabezados"] = None
+            df = sincronizar_datos(backend, cache)
+        except Exception as e:
+            st.warning(f"Error al leer {backend.nombre}: {e}")
+            # Forzamos reabrir la hoja y releer todo en el próximo intento
+            backend.reiniciar()
+            cache["encabezados"] = None
+            return cache["df"] if cache["df"] is not None else pd.DataFrame()
+
+        cache["df"] = df
+        cache["cargado_en"] = time.time()
+        if cache["foto_stock"] is not None and cache["foto_stock"] is not cache["foto_guardada"]:
+            try:
+                guardar_foto_stock(cache["foto_stock"], configuracion_almacenamiento()["foto_ruta"])
+                cache["foto_guardada"] = cache["foto_stock"]
+            except OSError:
+                pass  # Sin disco escribible: sólo se pierde el primer dibujo rápido
+        return df
+
+def marcar_datos_vencidos(cache):
+    # Marca los datos como vencidos: la próxima lectura trae sólo las filas nuevas
+    with cache["lock"]:
+        cache["cargado_en"] = 0.0
+        cache["version"] += 1
 
+def origenes_envio(clave_editor, df_editado, col_cantidad):
+    # Un token por fila de la grilla, guardado en la sesión mientras la cantidad de
+    # esa fila no cambie. Un doble clic o un reintento, aunque sea minutos después,
+    # reenvían los mismos ids; cambiar la cantidad es un movimiento nuevo.
+    previos = st.session_state.setdefault(f"origenes_{clave_editor}", {})
+    origenes = {}
+    for indice, cantidad in df_editado[col_cantidad].items():
+        valor = str(cantidad)
+        if indice not in previos or previos[indice][0] != valor:
+            previos[indice] = (valor, uuid.uuid4().hex[:12])
+        origenes[indice] = previos[indice][1]
+    return pd.Series(origenes, dtype=object)
+
+def ids_registrados(cache):
+    # Copia de los ids ya leídos: otra sesión puede estar sincronizando y agregando
+    # ids mientras se valida un guardado
+    with cache["lock"]:
+        return set(cache["ids_vistos"])
+
+# --- Cola de Escritura ---
+# Los guardados se anotan en un journal local y un hilo los envía en lotes;
+# cuando termina un envío, el caché se marca vencido desde ese mismo hilo.
+# Hay una sola cola por proceso (un solo hilo escribiendo el journal), y no se
+# descarta al forzar la recarga: sólo se la vuelve a apuntar al backend nuevo.
+@st.cache_resource
+def obtener_cola_escritura():
+    config = configuracion_almacenamiento()
+    return ColaEscritura(obtener_backend(), config["journal_ruta"])
+
+def conectar_cola_escritura(cola, backend, cache):
+    cola.backend = backend
+    cola.al_vaciar = lambda: marcar_datos_vencidos(cache)
+
+# --- Historial Archivado ---
+# Los movimientos viejos viven en un Parquet aparte (ver archivo_historial.py) y
+# sólo se leen cuando alguien pide un rango más largo. La firma del archivo
+# cambia en cada corrida de archivado e invalida las consultas guardadas.
+@st.cache_data(ttl=CACHE_TTL_SEGUNDOS, max_entries=20)
+def consultar_archivo(ruta, desde, hasta, firma):
+    return cargar_archivo(ruta, desde, hasta)
+
+def mostrar_historial_archivado(descripciones, clave):
+    ruta = configuracion_almacenamiento()["archivo_ruta"]
+    firma = firma_archivo(ruta)
+    if firma is None:
+        return
+    with st.expander("🗄️ Historial Archivado"):
+        hoy = datetime.now().date()
+        rango = st.date_input("Rango de fechas", value=(hoy - timedelta(days=365), hoy), key=f"rango_archivo_{clave}")
+        if st.button("Consultar archivo", key=f"consultar_archivo_{clave}") and len(rango) == 2:
+            desde, hasta = rango
+            df_archivo = consultar_archivo(ruta, desde, hasta + timedelta(days=1), firma)
+            df_archivo = df_archivo[df_archivo['material_codigo'].isin(descripciones)]
+            st.caption(f"{len(df_archivo)} movimientos archivados en el rango")
+            st.dataframe(df_archivo.sort_values('fecha_hora', ascending=False), use_container_width=True)
+
+# --- Catálogo ---
+# El catálogo vive en un CSV editable (por defecto catalogo_materiales.csv, creado
+# con el catálogo original la primera vez). Un solo dueño por proceso; en cada
+# rerun sólo se verifica si el archivo cambió.
+@st.cache_resource
+def obtener_catalogo_persistente():
+    return CatalogoPersistente(configuracion_almacenamiento()["catalogo_ruta"])
+
+# --- Primer Dibujo ---
+# Recién arrancado el proceso todavía no hay datos en memoria: mientras se conecta y
+# se descarga la hoja, los reportes muestran la última foto de stock guardada.
+def mostrar_reporte_guardado(marcador, catalogo_tipo, catalogo, foto):
+    with marcador.container():
+        df_display = calcular_reporte_stock(None, catalogo_tipo, indice=catalogo.por_descripcion, foto=foto)
+        df_display['Días Restantes'] = df_display['Días Restantes'].apply(lambda x: "Sin Consumo" if x==np.inf else round(x,1))
+        st.dataframe(df_display, use_container_width=True)
+        st.caption("⏳ Última foto guardada; se actualiza al llegar los datos.")
+
+# --- Alertas ---
+# Las evalúa alertas.py, programado y sin interfaz, y las deja en alertas_ruta:
+# la página sólo lee ese archivo. Si el evaluador todavía no corrió, o su última
+# corrida tiene más de alertas_vigencia_minutos (se cortó el proceso programado),
+# se calculan acá sobre el reporte de la pestaña, con los mismos umbrales (alertas_umbrales).
+def estado_alertas_vigente(estado, vigencia_minutos, ahora):
     try:
-        sheet = client.open("Base de Datos Fábrica").sheet1
-        
-        # Verificar si faltan encabezados
-        if not sheet.acell('A1').value:
-            sheet.append_row(['material_codigo', 'fecha_hora', 'cantidad', 'planta'])
-            time.sleep(1)
-
-        # Sanitizar cantidad
-        cant_raw = nuevo_dato['cantidad']
-        if isinstance(cant_raw, list):
-            cant_final = float(cant_raw[0])
-        else:
-            cant_final = float(cant_raw)
-            
-        # --- CAMBIO CLAVE: FORMATO ISO (Año-Mes-Día) ---
-        # Esto evita que 10/12 se confunda con 12/10
-        fecha_iso = nuevo_dato['fecha_hora'].strftime("%Y-%m-%d %H:%M:%S")
-        
-        fila = [
-            str(nuevo_dato['material_descripcion']),
-            fecha_iso, # Usamos formato universal
-            cant_final,
-            str(nuevo_dato['planta'])
-        ]
-        
-        sheet.append_row(fila)
-        return True
-        
-    except Exception as e:
-        st.error(f"Error al guardar '{nuevo_dato['material_descripcion']}': {e}")
+        evaluado_en = datetime.fromisoformat(estado["evaluado_en"])
+    except (KeyError, TypeError, ValueError):
         return False
+    return ahora - evaluado_en <= timedelta(minutes=float(vigencia_minutos))
 
-def calcular_consumo_diario(df_historial):
-    if len(df_historial) < 2:
-        return 0
-    # Aseguramos orden cronológico para el cálculo
-    df = df_historial.sort_values('fecha_hora').copy()
-    df = df.dropna(subset=['cantidad'])
-    
-    if len(df) < 2: return 0
-    
-    df['Consumo'] = df['cantidad'].diff(-1) * -1
-    df['Dias'] = df['fecha_hora'].diff(-1).dt.total_seconds().abs() / (24 * 3600)
-    
-    df_consumo = df[df['Consumo'] > 0]
-    
-    if df_consumo.empty or df_consumo['Dias'].sum() == 0:
-        return 0
-        
-    return df_consumo['Consumo'].sum() / df_consumo['Dias'].sum()
-
-# --- Catálogo Completo ---
-# (Mantenemos tu catálogo original)
-materiales_catalogo = pd.DataFrame([
-    # Insumos Combet 2
-    {'codigo': 'PFD742-00/TD', 'descripcion': 'Diluyente', 'tipo': 'INSUMO', 'unidad': 'litros', 'planta': 'Combet 2'},
-    {'codigo': 'Dowanol', 'descripcion': 'Dowanol', 'tipo': 'INSUMO', 'unidad': 'litros', 'planta': 'Combet 2'},
-    {'codigo': '911114-C2', 'descripcion': 'Master Blanco', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '921020', 'descripcion': 'Master perlado', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '1401577-S', 'descripcion': 'Master Amarillo K', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '151410-S', 'descripcion': 'Master Rojo', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '961515-C2', 'descripcion': 'Master Azul', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '961150-C2', 'descripcion': 'Master Celeste', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '1303342-S-C2', 'descripcion': 'Master Amarillo', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': 'SL 342', 'descripcion': 'Adhesivo laminadora', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': 'R405', 'descripcion': 'Catalizador', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '901300', 'descripcion': 'Antibloking', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '901213', 'descripcion': 'Antiestatico', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '400700-ST', 'descripcion': 'Matif', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': 'FM-250375', 'descripcion': 'Carbonato', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '400998-S', 'descripcion': 'Hoslip 15', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 2'},
-    {'codigo': '1260 MT cristal', 'descripcion': 'Hilo 1260', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': '2520 AT cristal', 'descripcion': 'Hilo 2500', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Hilo Poliester', 'descripcion': 'Hilo Poliester', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Crepp Blanco', 'descripcion': 'Crepp Blanco', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Crepp Rojo', 'descripcion': 'Crepp Rojo', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Crepp Negro', 'descripcion': 'Crepp Negro', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Crepp Verde', 'descripcion': 'Crepp Verde', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Streecht', 'descripcion': 'Streecht', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Flejes Manual', 'descripcion': 'Flejes Manual', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Flejes semi-automatico', 'descripcion': 'Flejes semi-automatico', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Hebillas', 'descripcion': 'Hebillas', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Gas', 'descripcion': 'Gas', 'tipo': 'INSUMO', 'unidad': 'litros', 'planta': 'Combet 2'},
-    {'codigo': '5.3 EB', 'descripcion': 'Cinta Doble Faz', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Abrefácil', 'descripcion': 'Abrefácil', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Conos 3"', 'descripcion': 'Conos 3"', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Conos 4"', 'descripcion': 'Conos 4"', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Conos 6"', 'descripcion': 'Conos 6"', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Separadores (Cartón)', 'descripcion': 'Separadores (Cartón)', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Esquineros', 'descripcion': 'Esquineros', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Teflón Lamina s/ad 1m An', 'descripcion': 'Teflón Lamina s/ad 1m An', 'tipo': 'INSUMO', 'unidad': 'm', 'planta': 'Combet 2'},
-    {'codigo': 'Teflón Cinta c/ad 5 cm', 'descripcion': 'Teflón Cinta c/ad 5 cm', 'tipo': 'INSUMO', 'unidad': 'm', 'planta': 'Combet 2'},
-    {'codigo': 'Teflón Cinta c/ad 2,5 cm', 'descripcion': 'Teflón Cinta c/ad 2,5 cm', 'tipo': 'INSUMO', 'unidad': 'm', 'planta': 'Combet 2'},
-    {'codigo': 'Teflón Cinta c/ad 1,5 cm', 'descripcion': 'Teflón Cinta c/ad 1,5 cm', 'tipo': 'INSUMO', 'unidad': 'm', 'planta': 'Combet 2'},
-    {'codigo': 'Resistencias 5mm', 'descripcion': 'Resistencias 5mm', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Ø1/4x38mm', 'descripcion': 'Resistencias 150W Máq.3', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Ø3/8x100mm', 'descripcion': 'Resistencias 100W Máq.4', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'DRx2 / UY1973', 'descripcion': 'Agujas GROZ-BECKERT', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    {'codigo': 'Pallet 100x120', 'descripcion': 'Pallet 100x120', 'tipo': 'INSUMO', 'unidad': 'un', 'planta': 'Combet 2'},
-    # Insumos Combet 1
-    {'codigo': '911114-C1', 'descripcion': 'Master Blanco', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 1'},
-    {'codigo': '961515-C1', 'descripcion': 'Master Azul', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 1'},
-    {'codigo': '961150-C1', 'descripcion': 'Master Celeste', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 1'},
-    {'codigo': '1303342-S-C1', 'descripcion': 'Master Amarillo', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 1'},
-    {'codigo': '1504724-S', 'descripcion': 'Master Rojo', 'tipo': 'INSUMO', 'unidad': 'kg', 'planta': 'Combet 1'},
-    # Materias Primas
-    {'codigo': 'KYD 6200K', 'descripcion': 'KYD 6200K', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LYD 6200K', 'descripcion': 'LYD 6200K', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'KYD 6110K', 'descripcion': 'KYD 6110K', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': '1102K', 'descripcion': '1102K', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'SYMBIOS 3102', 'descripcion': 'SYMBIOS 3102', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'SYMBIOS 4102', 'descripcion': 'SYMBIOS 4102', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'HT ES RFD 6140K', 'descripcion': 'HT ES RFD 6140K', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'HT ES RFD 6190K', 'descripcion': 'HT ES RFD 6190K', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'HT ES SP340', 'descripcion': 'HT ES SP340', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LLDPE 1630', 'descripcion': 'LLDPE 1630', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': '1102T', 'descripcion': '1102T', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'XSD 6200T', 'descripcion': 'XSD 6200T', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'AGILITY 7000', 'descripcion': 'AGILITY 7000', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'H103', 'descripcion': 'H103', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'H301', 'descripcion': 'H301', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'HE150', 'descripcion': 'HE150', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'H503', 'descripcion': 'H503', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LPD 230N', 'descripcion': 'LPD 230N', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'POLYETHYLENE 722', 'descripcion': 'POLYETHYLENE 722', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'POLIAMIDA 1030B', 'descripcion': 'POLIAMIDA 1030B', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LLDPE 1613.11', 'descripcion': 'LLDPE 1613.11', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LLDPE 1613/0', 'descripcion': 'LLDPE 1613/0', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LDPE 208M', 'descripcion': 'LDPE 208M', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LDPE 207M', 'descripcion': 'LDPE 207M', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LDPE 203M', 'descripcion': 'LDPE 203M', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'GM9450F 1666', 'descripcion': 'GM9450F 1666', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'ALC-30', 'descripcion': 'ALC-30', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'LLDPE 1630 C1', 'descripcion': 'LLDPE 1630 C1', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'HDPE 7000', 'descripcion': 'HDPE 7000', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'},
-    {'codigo': 'EVAL H171B', 'descripcion': 'EVAL H171B', 'tipo': 'MATERIA PRIMA', 'unidad': 'kg', 'planta': 'Materias Primas'}
-])
+def mostrar_alertas(df_reporte, catalogo_tipo, tipo):
+    config = configuracion_almacenamiento()
+    ahora = datetime.now()
+    estado = leer_estado_alertas(config["alertas_ruta"])
+    vigencia = config["alertas_vigencia_minutos"]
+    if estado is not None and estado_alertas_vigente(estado, vigencia, ahora):
+        activas = estado["activas"]
+        nota = f"Evaluadas por el evaluador programado el {estado['evaluado_en']}."
+    else:
+        activas = evaluar_alertas(df_reporte, catalogo_tipo, cargar_umbrales(config["alertas_umbrales"]))
+        nota = f"Calculadas en esta página el {ahora.isoformat(timespec='seconds')}: "
+        if estado is None:
+            nota += "el evaluador programado todavía no corrió."
+        else:
+            nota += (f"la última corrida del evaluador programado ({estado.get('evaluado_en', '?')}) "
+                     f"tiene más de {float(vigencia):g} minutos.")
+    tabla = tabla_alertas(activas, tipo)
+    if tabla.empty:
+        st.caption(f"✅ Sin alertas de stock bajo. {nota}")
+    else:
+        st.warning("⚠️ Alertas de Stock Bajo")
+        st.dataframe(tabla, use_container_width=True)
+        st.caption(nota)
+
+# --- Rendimiento ---
+# Panel siempre visible (también después de un error) con lo que midió instrumentacion.py.
+# Con STOCK_METRICAS_LOG (o metricas_log en [almacenamiento]) los eventos se
+# guardan además en un archivo, un JSON por línea.
+@st.cache_resource
+def configurar_instrumentacion():
+    INSTRUMENTACION.configurar_archivo(configuracion_almacenamiento().get("metricas_log"))
+
+def mostrar_panel_rendimiento():
+    rerun = INSTRUMENTACION.rerun_actual()
+    with st.sidebar.expander("⏱️ Rendimiento"):
+        if rerun is not None:
+            contadores = rerun['contadores']
+            st.caption(
+                f"Este rerun: {(time.time() - rerun['inicio']) * 1000:.0f} ms, "
+                f"{contadores.get('pedidos_sheets', 0)} pedidos a Sheets, "
+                f"{contadores.get('filas_leidas', 0)} filas leídas, "
+                f"{contadores.get('filas_descartadas', 0)} descartadas"
+            )
+            if 'primer_dibujo' in rerun['marcas']:
+                st.caption(f"Primer dibujo: {rerun['marcas']['primer_dibujo'] * 1000:.0f} ms")
+            if rerun['tramos']:
+                comunes = {'tipo', 'nombre', 'inicio', 'segundos', 'hilo'}
+                st.dataframe(pd.DataFrame([{
+                    'Tramo': t['nombre'],
+                    'ms': round(t['segundos'] * 1000, 1),
+                    'Detalle': ", ".join(f"{k}={v}" for k, v in t.items() if k not in comunes),
+                } for t in rerun['tramos']]), hide_index=True, use_container_width=True)
+
+        st.caption("Acumulado del proceso")
+        agregados = dict(INSTRUMENTACION.agregados)
+        if agregados:
+            st.dataframe(pd.DataFrame([{
+                'Tramo': nombre,
+                'Veces': a['n'],
+                'Promedio ms': round(a['total'] / a['n'] * 1000, 1),
+                'Máximo ms': round(a['max'] * 1000, 1),
+            } for nombre, a in agregados.items()]), hide_index=True, use_container_width=True)
+        st.caption(", ".join(f"{k}: {v}" for k, v in INSTRUMENTACION.contadores.items()) or "Sin contadores todavía")
+        st.download_button("Exportar log (JSONL)", INSTRUMENTACION.exportar_jsonl(),
+                           file_name="metricas_stock.jsonl", mime="application/json")
 
 # --- Interfaz Principal ---
+# Primero se dibuja lo que no depende de la hoja (catálogo, grillas de carga y la
+# última foto de stock) mientras el hilo de conexión autoriza y abre la hoja;
+# después se esperan los datos y se completa cada pestaña.
 try:
-    gspread_client = conectar_google_client()
-    if gspread_client is None:
-        st.stop()
+    configurar_instrumentacion()
+    conexion = iniciar_conexion()
+
+    catalogo_persistente = obtener_catalogo_persistente()
+    catalogo = catalogo_persistente.actual()
+    cache_info = obtener_cache_datos()
+    aviso_conexion = st.empty()
 
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "Materias Primas",
         "Insumos",
+        "📥 Importar Conteo",
         "🔧 Gestión de Materiales",
         "📋 Catálogo Actualizado"
     ])
@@ -248,7 +363,7 @@ try:
     # --- TAB 1: Materias Primas ---
     with tab1:
         st.subheader("Carga Masiva de Materias Primas")
-        materias_primas_cat = materiales_catalogo[materiales_catalogo['tipo']=='MATERIA PRIMA']
+        materias_primas_cat = catalogo.de_tipo('MATERIA PRIMA')
         df_materias = materias_primas_cat[['descripcion','planta']].copy()
         df_materias['Cantidad (kg)'] = None
 
@@ -268,83 +383,19 @@ try:
                 )
             }
         )
-        
-        # Botón con Lógica de Espera (Loop Completo -> Rerun)
-        if st.button("💾 Guardar todas las Materias Primas"):
-            filas_guardadas = 0
-            with st.spinner("Guardando en la nube..."):
-                for _, fila in data_materias.iterrows():
-                    if pd.isna(fila["Cantidad (kg)"]) or fila["Cantidad (kg)"] == "":
-                        continue
-                    
-                    nuevo_dato = {
-                        "material_descripcion": fila["descripcion"],
-                        "cantidad": fila["Cantidad (kg)"],
-                        "fecha_hora": datetime.now(),
-                        "planta": fila["planta"]
-                    }
-                    if guardar_dato_gsheet(gspread_client, nuevo_dato):
-                        filas_guardadas += 1
-            
-            if filas_guardadas > 0:
-                st.success(f"✅ Se guardaron {filas_guardadas} movimientos.")
-                st.cache_resource.clear()
-                time.sleep(2)
-                st.rerun()
-            else:
-                st.warning("No ingresaste cantidades para guardar.")
+
+        guardado_mp = st.container()
 
         # Reporte y Alertas
         st.markdown("---")
         st.subheader("📊 Reportes de Stock")
-        df_stock = cargar_y_procesar_datos(gspread_client)
-        
-        if not df_stock.empty:
-            reporte_mp = []
-            for desc in materias_primas_cat['descripcion']:
-                # Ordenar historial para asegurar que iloc[-1] sea el último real
-                df_hist = df_stock[df_stock['material_codigo']==desc].sort_values('fecha_hora')
-                
-                ultimo_stock = df_hist['cantidad'].iloc[-1] if not df_hist.empty else 0
-                consumo = calcular_consumo_diario(df_hist)
-                dias_rest = ultimo_stock/consumo if consumo>0 else np.inf
-                fecha_agot = (datetime.now()+timedelta(days=dias_rest)).strftime('%Y-%m-%d') if dias_rest!=np.inf else "Sin Consumo"
-                row_cat = materias_primas_cat[materias_primas_cat['descripcion']==desc].iloc[0]
-                reporte_mp.append({
-                    'Código': row_cat['codigo'],
-                    'Descripción': desc,
-                    'Planta': row_cat['planta'],
-                    'Último Stock': ultimo_stock,
-                    'Unidad': row_cat['unidad'],
-                    'Consumo Diario Prom.': round(consumo,2),
-                    'Días Restantes': dias_rest,
-                    'Fecha Agotamiento': fecha_agot
-                })
-            
-            df_reporte_mp = pd.DataFrame(reporte_mp)
-            
-            # Display visual
-            df_display = df_reporte_mp.copy()
-            df_display['Días Restantes'] = df_display['Días Restantes'].apply(lambda x: "Sin Consumo" if x==np.inf else round(x,1))
-            st.dataframe(df_display, use_container_width=True)
-
-            # Alertas
-            alertas_num = df_reporte_mp[df_reporte_mp['Días Restantes'] != np.inf].copy()
-            alertas_num = alertas_num[alertas_num['Días Restantes'] <= 15]
-            if not alertas_num.empty:
-                st.warning("⚠️ Alertas de Stock Bajo (< 15 días)")
-                st.dataframe(alertas_num[['Código','Descripción','Planta','Días Restantes','Unidad']])
-        else:
-            st.info("No hay datos cargados en el historial todavía.")
-
-        st.subheader("📖 Historial Reciente")
-        if not df_stock.empty:
-            st.dataframe(df_stock[df_stock['material_codigo'].isin(materias_primas_cat['descripcion'])].sort_values('fecha_hora',ascending=False).head(50), use_container_width=True)
+        reporte_mp = st.empty()
+        historial_mp = st.container()
 
     # --- TAB 2: Insumos ---
     with tab2:
         st.subheader("Carga Masiva de Insumos")
-        insumos_cat = materiales_catalogo[materiales_catalogo['tipo']=='INSUMO']
+        insumos_cat = catalogo.de_tipo('INSUMO')
         df_insumos = insumos_cat[['descripcion','planta','unidad']].copy()
         df_insumos['Cantidad'] = None
         
@@ -364,72 +415,225 @@ try:
                 )
             }
         )
-        
-        if st.button("💾 Guardar todos los Insumos"):
-            filas_guardadas = 0
-            with st.spinner("Guardando en la nube..."):
-                for _, fila in data_insumos.iterrows():
-                    if pd.isna(fila["Cantidad"]) or fila["Cantidad"] == "":
-                        continue
-                    nuevo_dato = {
-                        "material_descripcion": fila["descripcion"],
-                        "cantidad": fila["Cantidad"],
-                        "fecha_hora": datetime.now(),
-                        "planta": fila["planta"]
-                    }
-                    if guardar_dato_gsheet(gspread_client, nuevo_dato):
-                        filas_guardadas += 1
-            
-            if filas_guardadas > 0:
-                st.success(f"✅ Se guardaron {filas_guardadas} insumos.")
-                st.cache_resource.clear()
-                time.sleep(2)
-                st.rerun()
-            else:
-                st.warning("No ingresaste cantidades.")
+
+        guardado_ins = st.container()
 
         # Reporte Insumos
         st.markdown("---")
         st.subheader("📊 Reportes de Stock")
-        df_stock = cargar_y_procesar_datos(gspread_client) # Recargamos por seguridad
+        reporte_ins = st.empty()
+        historial_ins = st.container()
+
+    # --- TAB 5: Catálogo ---
+    with tab5:
+        st.subheader("📋 Catálogo Actualizado")
+        tabla_catalogo = st.empty()
+        tabla_catalogo.dataframe(catalogo.df, use_container_width=True)
+
+    # Proceso recién arrancado: reportes con la última foto guardada
+    if cache_info["df"] is None:
+        foto_guardada = leer_foto_stock(configuracion_almacenamiento()["foto_ruta"])
+        if foto_guardada is not None:
+            mostrar_reporte_guardado(reporte_mp, materias_primas_cat, catalogo, foto_guardada)
+            mostrar_reporte_guardado(reporte_ins, insumos_cat, catalogo, foto_guardada)
+    marca("primer_dibujo")
+
+    # --- Datos ---
+    if not conexion.lista:
+        aviso_conexion.info("⏳ Conectando con el almacenamiento...")
+    backend = obtener_backend()
+    aviso_conexion.empty()
+    if backend is None:
+        st.stop()
+    cola_escritura = obtener_cola_escritura()
+    conectar_cola_escritura(cola_escritura, backend, cache_info)
+
+    # Una sola lectura por rerun, compartida por todas las pestañas
+    df_stock = obtener_datos_stock(backend)
+
+    st.sidebar.caption(f"Almacenamiento: {backend.nombre}")
+    st.sidebar.caption(
+        f"Caché de datos: {cache_info['hits']} aciertos / {cache_info['misses']} fallos "
+        f"(versión {cache_info['version']}, TTL {CACHE_TTL_SEGUNDOS}s)"
+    )
+    st.sidebar.caption(
+        f"Sincronización: {cache_info['filas_ingeridas']} filas en hoja, "
+        f"{cache_info['filas_incrementales']} traídas en forma incremental, "
+        f"{cache_info['resyncs']} resincronizaciones completas, "
+        f"{cache_info['duplicados_descartados']} duplicados descartados"
+    )
+    st.sidebar.caption(
+        f"Memoria del historial: {cache_info['memoria_compacta'] / 1e6:.1f} MB "
+        f"(como texto serían ~{cache_info['lectura'].get('memoria_texto', 0) / 1e6:.1f} MB)"
+    )
+    # La foto por material se mantiene en cada sincronización; los reportes la leen directo
+    foto_stock = cache_info['foto_stock']
+    if foto_stock is not None:
+        st.sidebar.caption(
+            f"Foto de stock: {len(foto_stock)} materiales, "
+            f"{cache_info['foto_actualizados']} actualizados en la última sincronización"
+        )
+    lectura = cache_info['lectura']
+    if lectura:
+        formatos = ", ".join(f"{fmt}: {n}" for fmt, n in lectura.get('formatos_fecha', {}).items())
+        st.sidebar.caption(
+            f"Lectura: {lectura.get('filas_leidas', 0)} filas, "
+            f"{lectura.get('descartes_fecha', 0)} descartadas por fecha, "
+            f"{lectura.get('descartes_cantidad', 0)} por cantidad. Fechas por formato: {formatos}"
+        )
+    m_cola = cola_escritura.metricas
+    latencia = f"{m_cola['ultima_latencia'] * 1000:.0f} ms" if m_cola['ultima_latencia'] is not None else "-"
+    st.sidebar.caption(
+        f"Cola de escritura: {cola_escritura.profundidad} pendientes, "
+        f"último envío {latencia}, {m_cola['escritos']} filas enviadas"
+    )
+    if m_cola['ultimo_error']:
+        st.sidebar.warning(f"La cola reintenta el envío: {m_cola['ultimo_error']}")
+    if isinstance(getattr(backend, 'client', None), ClienteSheetsLimitado):
+        m = backend.client.metricas
+        st.sidebar.caption(
+            f"API Sheets: {m['pedidos']} pedidos, {m['reintentos']} reintentos, "
+            f"{m['esperas_limite']} esperas por cuota ({m['segundos_espera_limite']:.1f}s), "
+            f"{m['lecturas_coalescidas']} lecturas compartidas, {m['errores']} errores"
+        )
+
+    # --- TAB 1: Materias Primas (datos) ---
+    with guardado_mp:
+        # Botón de Guardado en Lote (un solo pedido -> Rerun)
+        if "aviso_guardado_mp" in st.session_state:
+            st.success(st.session_state.pop("aviso_guardado_mp"))
+
+        if st.button("💾 Guardar todas las Materias Primas"):
+            # Vuelve enseguida: el envío a la nube lo hace la cola en segundo plano
+            resultado = encolar_lote(cola_escritura, data_materias, "Cantidad (kg)", ids_vistos=ids_registrados(cache_info),
+                                     origen=origenes_envio("editor_materias", data_materias, "Cantidad (kg)"))
+            filas_guardadas = int((resultado['estado'] == 'encolado').sum())
+            errores = resultado[resultado['estado'] == 'error']
+            for _, err in errores.iterrows():
+                st.error(f"Error al guardar '{err['descripcion']}': {err['detalle']}")
+            duplicados = int((resultado['estado'] == 'duplicado').sum())
+            if duplicados:
+                st.info(f"Se omitieron {duplicados} movimientos ya registrados (doble clic o reintento).")
+
+            if filas_guardadas > 0:
+                aviso = f"✅ Se registraron {filas_guardadas} movimientos. Se envían a la nube en segundo plano."
+                if errores.empty:
+                    # El aviso se muestra después del rerun, sin pausa fija
+                    st.session_state["aviso_guardado_mp"] = aviso
+                    st.rerun()
+                st.success(aviso)
+            elif errores.empty and not duplicados:
+                st.warning("No ingresaste cantidades para guardar.")
+
+    with reporte_mp.container():
         if not df_stock.empty:
-            reporte_ins = []
-            for desc in insumos_cat['descripcion']:
-                df_hist = df_stock[df_stock['material_codigo']==desc].sort_values('fecha_hora')
-                ultimo_stock = df_hist['cantidad'].iloc[-1] if not df_hist.empty else 0
-                consumo = calcular_consumo_diario(df_hist)
-                dias_rest = ultimo_stock/consumo if consumo>0 else np.inf
-                fecha_agot = (datetime.now()+timedelta(days=dias_rest)).strftime('%Y-%m-%d') if dias_rest!=np.inf else "Sin Consumo"
-                row_cat = insumos_cat[insumos_cat['descripcion']==desc].iloc[0]
-                reporte_ins.append({
-                    'Código': row_cat['codigo'],
-                    'Descripción': desc,
-                    'Planta': row_cat['planta'],
-                    'Último Stock': ultimo_stock,
-                    'Unidad': row_cat['unidad'],
-                    'Consumo Diario Prom.': round(consumo,2),
-                    'Días Restantes': dias_rest,
-                    'Fecha Agotamiento': fecha_agot
-                })
-            df_reporte_ins = pd.DataFrame(reporte_ins)
+            with tramo("reporte", pestania="materias_primas"):
+                df_reporte_mp = calcular_reporte_stock(df_stock, materias_primas_cat, indice=catalogo.por_descripcion, foto=foto_stock)
             
-            df_display = df_reporte_ins.copy()
+            # Display visual
+            df_display = df_reporte_mp.copy()
             df_display['Días Restantes'] = df_display['Días Restantes'].apply(lambda x: "Sin Consumo" if x==np.inf else round(x,1))
             st.dataframe(df_display, use_container_width=True)
 
-            alertas_num = df_reporte_ins[df_reporte_ins['Días Restantes'] != np.inf].copy()
-            alertas_num = alertas_num[alertas_num['Días Restantes'] <= 30]
+            mostrar_alertas(df_reporte_mp, materias_primas_cat, 'MATERIA PRIMA')
+        else:
+            st.info("No hay datos cargados en el historial todavía.")
+
+    with historial_mp:
+        st.subheader("📖 Historial Reciente")
+        if not df_stock.empty:
+            st.dataframe(movimientos_recientes(df_stock, materias_primas_cat['descripcion'], 50), use_container_width=True)
+        mostrar_historial_archivado(materias_primas_cat['descripcion'], "mp")
+
+    # --- TAB 2: Insumos (datos) ---
+    with guardado_ins:
+        if "aviso_guardado_ins" in st.session_state:
+            st.success(st.session_state.pop("aviso_guardado_ins"))
+
+        if st.button("💾 Guardar todos los Insumos"):
+            # Vuelve enseguida: el envío a la nube lo hace la cola en segundo plano
+            resultado = encolar_lote(cola_escritura, data_insumos, "Cantidad", ids_vistos=ids_registrados(cache_info),
+                                     origen=origenes_envio("editor_insumos", data_insumos, "Cantidad"))
+            filas_guardadas = int((resultado['estado'] == 'encolado').sum())
+            errores = resultado[resultado['estado'] == 'error']
+            for _, err in errores.iterrows():
+                st.error(f"Error al guardar '{err['descripcion']}': {err['detalle']}")
+            duplicados = int((resultado['estado'] == 'duplicado').sum())
+            if duplicados:
+                st.info(f"Se omitieron {duplicados} movimientos ya registrados (doble clic o reintento).")
+
+            if filas_guardadas > 0:
+                aviso = f"✅ Se registraron {filas_guardadas} insumos. Se envían a la nube en segundo plano."
+                if errores.empty:
+                    # El aviso se muestra después del rerun, sin pausa fija
+                    st.session_state["aviso_guardado_ins"] = aviso
+                    st.rerun()
+                st.success(aviso)
+            elif errores.empty and not duplicados:
+                st.warning("No ingresaste cantidades.")
+
+    with reporte_ins.container():
+        if not df_stock.empty:
+            with tramo("reporte", pestania="insumos"):
+                df_reporte_ins = calcular_reporte_stock(df_stock, insumos_cat, indice=catalogo.por_descripcion, foto=foto_stock)
             
-            if not alertas_num.empty:
-                st.warning("⚠️ Alertas de Stock Bajo (< 30 días)")
-                st.dataframe(alertas_num[['Código','Descripción','Planta','Días Restantes','Unidad']])
-        
+            df_display = df_reporte_ins.copy()
+            df_display['Días Restantes'] = df_display['Días Restantes'].apply(lambda x: "Sin Consumo" if x==np.inf else round(x,1))
+            st.dataframe(df_display, use_container_width=True)
+
+            mostrar_alertas(df_reporte_ins, insumos_cat, 'INSUMO')
+
+    with historial_ins:
         st.subheader("📖 Historial Reciente")
         if not df_stock.empty:
-            st.dataframe(df_stock[df_stock['material_codigo'].isin(insumos_cat['descripcion'])].sort_values('fecha_hora',ascending=False).head(50), use_container_width=True)
+            st.dataframe(movimientos_recientes(df_stock, insumos_cat['descripcion'], 50), use_container_width=True)
+        mostrar_historial_archivado(insumos_cat['descripcion'], "ins")
 
-    # --- TAB 3: Gestión ---
+    # --- TAB 3: Importar Conteo ---
+    # Para los conteos físicos mensuales: en vez de tipear cientos de cantidades en
+    # las grillas, se sube la planilla. Primero se revisa sin guardar y después se
+    # importa; las filas van a la cola de escritura, que las envía en lotes.
     with tab3:
+        st.subheader("📥 Importar Conteo Físico")
+        st.caption("Planilla .xlsx o .csv con las columnas Código (o Descripción y Planta) y Cantidad.")
+        archivo_conteo = st.file_uploader("Planilla de conteo", type=["xlsx", "xlsm", "csv"], key="archivo_conteo")
+        if archivo_conteo is not None:
+            col_revisar, col_importar = st.columns(2)
+            revisar = col_revisar.button("🔍 Revisar (sin guardar)")
+            importar = col_importar.button("📥 Importar conteo")
+            if revisar or importar:
+                try:
+                    resultados_imp, resumen_imp = importar_conteo(
+                        io.BytesIO(archivo_conteo.getvalue()), catalogo, cola_escritura.encolar,
+                        nombre=archivo_conteo.name, simular=not importar,
+                        ids_vistos=ids_registrados(cache_info) | cola_escritura.ids_encolados(),
+                    )
+                    st.session_state["resultado_importacion"] = (archivo_conteo.name, resultados_imp, resumen_imp)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+
+        if "resultado_importacion" in st.session_state:
+            nombre_imp, resultados_imp, resumen_imp = st.session_state["resultado_importacion"]
+            estado_ok = 'valido' if resumen_imp['simulacion'] else 'importado'
+            accion = "Revisión" if resumen_imp['simulacion'] else "Importación"
+            st.markdown(f"**{accion} de {nombre_imp}:** {resumen_imp['filas']} filas en {resumen_imp['segundos']:.1f} s")
+            col_ok, col_err, col_dup, col_omi = st.columns(4)
+            col_ok.metric("Válidas" if resumen_imp['simulacion'] else "Importadas", resumen_imp.get(estado_ok, 0))
+            col_err.metric("Con errores", resumen_imp.get('error', 0))
+            col_dup.metric("Ya registradas", resumen_imp.get('duplicado', 0))
+            col_omi.metric("Sin cantidad", resumen_imp.get('omitido', 0))
+            if resumen_imp['error_escritura']:
+                st.error(f"Se cortó la importación: {resumen_imp['error_escritura']}. "
+                         "Al reimportar la planilla, lo ya guardado se omite.")
+            elif not resumen_imp['simulacion'] and resumen_imp.get(estado_ok, 0):
+                st.success("✅ Conteo registrado. Se envía a la nube en segundo plano.")
+            problemas = resultados_imp[resultados_imp['estado'].isin(['error', 'duplicado'])]
+            st.dataframe(problemas if not problemas.empty else resultados_imp, use_container_width=True)
+            st.download_button("⬇️ Descargar reporte (CSV)", resultados_imp.to_csv(index=False),
+                               file_name=f"reporte_{os.path.splitext(nombre_imp)[0]}.csv", mime="text/csv")
+
+    # --- TAB 4: Gestión ---
+    with tab4:
         st.subheader("🔧 Agregar o Eliminar Materiales del Catálogo")
         st.markdown("### ➕ Agregar Nuevo Material")
         with st.form("form_agregar_material"):
@@ -437,7 +641,7 @@ try:
             nueva_descripcion = st.text_input("Descripción")
             nuevo_tipo = st.selectbox("Tipo", ["MATERIA PRIMA", "INSUMO"])
             nueva_unidad = st.text_input("Unidad (kg, litros, un, etc.)")
-            nueva_planta = st.selectbox("Planta", sorted(materiales_catalogo['planta'].unique()))
+            nueva_planta = st.selectbox("Planta", catalogo.plantas())
             submitted_agregar = st.form_submit_button("Agregar Material")
             if submitted_agregar:
                 if nuevo_codigo and nueva_descripcion:
@@ -448,31 +652,29 @@ try:
                         'unidad': nueva_unidad.strip() if nueva_unidad else 'N/A',
                         'planta': nueva_planta
                     }
-                    if nuevo_codigo in materiales_catalogo['codigo'].values:
-                        st.warning("⚠️ Ya existe un material con ese código.")
-                    else:
-                        materiales_catalogo.loc[len(materiales_catalogo)] = nuevo_material
+                    if catalogo_persistente.agregar(nuevo_material):
                         st.success(f"✅ Material '{nueva_descripcion}' agregado.")
+                    else:
+                        st.warning("⚠️ Ya existe un material con ese código.")
                 else:
                     st.error("❌ Completá al menos código y descripción.")
 
         st.markdown("---")
-        st.markdown("### 🗑️ Eliminar Material del Catálogo (Local)")
-        lista_descripciones = sorted(materiales_catalogo['descripcion'].unique())
+        st.markdown("### 🗑️ Eliminar Material del Catálogo")
+        lista_descripciones = catalogo.descripciones()
         material_a_borrar = st.selectbox("Seleccioná el material a eliminar", options=["(Seleccionar)"] + lista_descripciones)
         if material_a_borrar != "(Seleccionar)":
             st.warning(f"⚠️ Vas a eliminar: **{material_a_borrar}**.")
             confirmar = st.text_input("Escribí 'ELIMINAR' para confirmar:")
             if st.button("Eliminar Material"):
                 if confirmar.strip().upper() == "ELIMINAR":
-                    materiales_catalogo = materiales_catalogo[materiales_catalogo['descripcion'] != material_a_borrar]
+                    catalogo_persistente.eliminar_descripcion(material_a_borrar)
                     st.success(f"🗑️ Material eliminado.")
                     st.rerun()
 
-    # --- TAB 4: Catálogo ---
-    with tab4:
-        st.subheader("📋 Catálogo Actualizado")
-        st.dataframe(materiales_catalogo, use_container_width=True)
+    # Si la pestaña de Gestión cambió el catálogo en este rerun
+    if catalogo_persistente.actual() is not catalogo:
+        tabla_catalogo.dataframe(catalogo_persistente.actual().df, use_container_width=True)
 
 except Exception as e:
     st.error("Ocurrió un error inesperado en la aplicación.")
@@ -484,16 +686,22 @@ except Exception as e:
         col_debug_1, col_debug_2 = st.columns([1, 4])
         with col_debug_1:
             if st.button("🔄 Forzar Recarga"):
-                st.cache_resource.clear()
+                # Todo menos la cola de escritura, que puede tener envíos pendientes
+                iniciar_conexion.clear()
+                obtener_cache_datos.clear()
                 st.rerun()
         with col_debug_2:
             st.info("Si los datos no se actualizan, apretá el botón 'Forzar Recarga'.")
             
         st.write("### Datos Crudos en Google Sheets (Últimas 5 filas):")
-        # Leemos directo sin procesar para ver si el dato llegó
-        try:
-            raw_sheet = gspread_client.open("Base de Datos Fábrica").sheet1
-            raw_data = raw_sheet.get_all_values()
-            st.table(raw_data[-5:] if len(raw_data) > 5 else raw_data)
-        except:
-            st.write("No se pudo conectar para ver datos crudos.")
\ No newline at end of file
+        # Leemos directo sin procesar para ver si el dato llegó. Sólo a pedido y sólo
+        # la cola de la hoja: con la app con problemas no conviene descargar todo.
+        if st.button("👀 Ver últimas filas"):
+            try:
+                total = obtener_cache_datos()["filas_ingeridas"] or None
+                raw_headers, raw_filas = obtener_backend().ultimas(5, total)
+                st.table([raw_headers] + raw_filas)
+            except:
+                st.write("No se pudo conectar para ver datos crudos.")
+
+mostrar_panel_rendimiento()
\ No newline at end of file
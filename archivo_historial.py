@@ -0,0 +1,177 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from almacenamiento import ENCABEZADOS_DB, COLUMNA_ID, crear_backend_sin_interfaz, configuracion_desde_entorno
+from datos_stock import procesar_filas, deduplicar_movimientos, construir_foto_stock, COLUMNAS_FOTO
+
+# Archivo del historial viejo. Los movimientos anteriores al horizonte salen de
+# la hoja y pasan a un Parquet comprimido, particionado por mes y planta:
+#
+#   archivo_historial/movimientos/mes=2024-01/planta=Combet 2/parte-....parquet
+#   archivo_historial/resumen.parquet
+#
+# De cada material queda en la hoja su último movimiento archivado (el "ancla"),
+# así el último stock y el primer par de consumo siguen saliendo de la hoja.
+# El resumen guarda, por material, las sumas de consumo y días de todos los
+# pares archivados: sumado a la foto de stock, el consumo promedio da igual que
+# con la historia completa. pyarrow se importa recién al escribir o consultar
+# el archivo: la app no lo necesita para arrancar.
+
+RUTA_ARCHIVO = "archivo_historial"
+HORIZONTE_DIAS = 180
+CARPETA_MOVIMIENTOS = "movimientos"
+ARCHIVO_RESUMEN = "resumen.parquet"
+
+_RESUMENES = {}  # ruta -> (firma del archivo, DataFrame)
+
+
+def _ruta_resumen(ruta):
+    return os.path.join(ruta, ARCHIVO_RESUMEN)
+
+
+def firma_archivo(ruta=RUTA_ARCHIVO):
+    # Cambia cada vez que se archiva; sirve como clave de caché de las consultas
+    try:
+        return os.stat(_ruta_resumen(ruta)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def leer_resumen(ruta=RUTA_ARCHIVO):
+    # Devuelve el mismo objeto mientras el archivo no cambie (None si no hay archivo)
+    firma = firma_archivo(ruta)
+    if firma is None:
+        return None
+    guardado = _RESUMENES.get(ruta)
+    if guardado is None or guardado[0] != firma:
+        resumen = pd.read_parquet(_ruta_resumen(ruta))
+        resumen.index = pd.Index(resumen.index.astype(object), name='material_codigo')
+        guardado = (firma, resumen)
+        _RESUMENES[ruta] = guardado
+    return guardado[1]
+
+
+def _combinar_resumen(previo, nuevo):
+    if previo is None or previo.empty:
+        return nuevo
+    acumulado = previo[['suma_consumo', 'suma_dias']].reindex(nuevo.index, fill_value=0.0)
+    nuevo = nuevo.copy()
+    nuevo['suma_consumo'] += acumulado['suma_consumo']
+    nuevo['suma_dias'] += acumulado['suma_dias']
+    nuevo['consumo_diario'] = (nuevo['suma_consumo'] / nuevo['suma_dias']).where(nuevo['suma_dias'] != 0, 0.0)
+    return pd.concat([previo.drop(nuevo.index, errors='ignore'), nuevo])[COLUMNAS_FOTO]
+
+
+def _escribir_movimientos(df, ruta, sello):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tabla = pd.DataFrame({
+        'material_codigo': df['material_codigo'].astype(str).to_numpy(),
+        'fecha_hora': df['fecha_hora'].to_numpy(),
+        'cantidad': df['cantidad'].astype('float64').to_numpy(),
+        'planta': df['planta'].astype(str).to_numpy(),
+        COLUMNA_ID: df[COLUMNA_ID].astype(str).to_numpy(),
+        'mes': df['fecha_hora'].dt.strftime('%Y-%m').to_numpy(),
+    })
+    # Nombre único por corrida: nunca se pisa una parte ya escrita
+    pq.write_to_dataset(
+        pa.Table.from_pandas(tabla, preserve_index=False),
+        root_path=os.path.join(ruta, CARPETA_MOVIMIENTOS),
+        partition_cols=['mes', 'planta'],
+        basename_template=f"parte-{sello}-{{i}}.parquet",
+        compression='zstd',
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+
+def archivar_historial(backend, ruta=RUTA_ARCHIVO, horizonte_dias=HORIZONTE_DIAS, ahora=None):
+    # -> dict con lo que se hizo
+    ahora = ahora or datetime.now()
+    corte = pd.Timestamp(ahora - timedelta(days=horizonte_dias))
+    resultado = {'leidas': 0, 'archivadas': 0, 'eliminadas': 0, 'materiales': 0, 'corte': str(corte)}
+
+    encabezados, filas = backend.cargar_todo()
+    resultado['leidas'] = len(filas)
+    df = procesar_filas(encabezados, filas)
+    if df.empty or 'fecha_hora' not in df.columns:
+        return resultado
+    viejas = df[df['fecha_hora'] < corte]
+    if viejas.empty:
+        return resultado
+
+    # Las copias repetidas de un mismo movimiento se borran sin archivarse dos veces
+    unicas, _ = deduplicar_movimientos(viejas.copy(), set())
+    anclas = unicas.groupby('material_codigo', sort=False, observed=True).tail(1).index
+    archivar = unicas.drop(anclas)
+    eliminar = set(viejas.index) - set(anclas)
+    if not eliminar:
+        return resultado
+    conservar = [i for i in range(len(filas)) if i not in eliminar]
+
+    os.makedirs(ruta, exist_ok=True)
+    # Orden pensado para no perder nada si algo falla a mitad de camino:
+    # 1) movimientos al Parquet, 2) resumen a un temporal, 3) se compacta la hoja,
+    # 4) recién ahí se publica el resumen. Si se corta antes de 4 y se vuelve a
+    # correr, las partes repetidas se descartan por id al consultar el archivo.
+    if not archivar.empty:
+        _escribir_movimientos(archivar, ruta, f"{datetime.now():%Y%m%d%H%M%S%f}")
+    resumen = _combinar_resumen(leer_resumen(ruta), construir_foto_stock(unicas))
+    temporal = _ruta_resumen(ruta) + ".tmp"
+    resumen.to_parquet(temporal, compression='zstd')
+    backend.compactar(conservar, len(filas))
+    os.replace(temporal, _ruta_resumen(ruta))
+
+    resultado.update({
+        'archivadas': len(archivar),
+        'eliminadas': len(eliminar),
+        'materiales': len(anclas),
+    })
+    return resultado
+
+
+def cargar_archivo(ruta=RUTA_ARCHIVO, desde=None, hasta=None, materiales=None):
+    # Lee sólo las particiones del rango pedido. Mismas columnas que el historial.
+    carpeta = os.path.join(ruta, CARPETA_MOVIMIENTOS)
+    if not os.path.isdir(carpeta):
+        return pd.DataFrame(columns=ENCABEZADOS_DB)
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(carpeta, format='parquet', partitioning='hive')
+    filtro = None
+    condiciones = []
+    if desde is not None:
+        desde = pd.Timestamp(desde)
+        condiciones += [ds.field('mes') >= f"{desde:%Y-%m}", ds.field('fecha_hora') >= desde.to_pydatetime()]
+    if hasta is not None:
+        hasta = pd.Timestamp(hasta)
+        condiciones += [ds.field('mes') <= f"{hasta:%Y-%m}", ds.field('fecha_hora') < hasta.to_pydatetime()]
+    if materiales is not None:
+        condiciones.append(ds.field('material_codigo').isin(list(materiales)))
+    for condicion in condiciones:
+        filtro = condicion if filtro is None else filtro & condicion
+
+    df = dataset.to_table(filter=filtro).to_pandas()
+    df['planta'] = df['planta'].astype(str)
+    df = df.drop_duplicates(COLUMNA_ID)[ENCABEZADOS_DB]
+    return df.sort_values('fecha_hora', kind='mergesort').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # Uso: python archivo_historial.py --horizonte-dias 180 [--archivo archivo_historial]
+    # El backend se elige con las mismas variables de entorno que la app (STOCK_BACKEND, ...).
+    parser = argparse.ArgumentParser(description="Archiva los movimientos viejos en Parquet")
+    parser.add_argument("--horizonte-dias", type=int, default=HORIZONTE_DIAS)
+    parser.add_argument("--archivo", default=None)
+    args = parser.parse_args()
+
+    config = configuracion_desde_entorno()
+    ruta = args.archivo or config.get("archivo_ruta", RUTA_ARCHIVO)
+    resultado = archivar_historial(crear_backend_sin_interfaz(config), ruta, args.horizonte_dias)
+    print(f"Corte {resultado['corte']}: {resultado['leidas']} filas leídas, "
+          f"{resultado['archivadas']} archivadas, {resultado['eliminadas']} sacadas de la hoja, "
+          f"{resultado['materiales']} materiales con ancla")
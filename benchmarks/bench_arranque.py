@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Arranque en frío de la app:
+#   1) tiempo de importación de los módulos propios de app.py en un intérprete
+#      nuevo, y qué módulos pesados quedan cargados (Google, pyarrow, openpyxl),
+#      comparado con los imports de Google que app.py hacía antes al arrancar;
+#   2) primer dibujo: un proceso nuevo corre la app con AppTest contra la hoja
+#      falsa, con una demora que simula importar google.auth, autorizar y abrir
+#      la hoja. Se anota en qué momento del rerun quedaron dibujados el catálogo,
+#      las grillas y los reportes con la última foto (marca "primer_dibujo") y
+#      cuándo terminó el rerun con los datos completos.
+# Uso: python benchmarks/bench_arranque.py [--filas 100000] [--autorizacion 1.5] [--latencia 0.2]
+
+MODULOS_APP = ["instrumentacion", "almacenamiento", "cliente_sheets", "cola_escritura", "catalogo",
+               "datos_stock", "archivo_historial", "alertas", "importacion"]
+MODULOS_GOOGLE_ANTES = ["gspread", "google.oauth2.credentials", "google.oauth2.service_account",
+                        "google_auth_oauthlib.flow", "google.auth.transport.requests"]
+MODULOS_PESADOS = ["gspread", "google.auth", "google_auth_oauthlib", "pyarrow", "openpyxl"]
+
+
+def medir_importacion(modulos, repeticiones=3):
+    # -> (ms medianos, módulos pesados cargados), siempre en un intérprete nuevo
+    codigo = (
+        "import sys, time, json\n"
+        f"sys.path.insert(0, {RAIZ!r})\n"
+        "import streamlit, pandas\n"
+        "t = time.perf_counter()\n"
+        f"for m in {modulos!r}: __import__(m)\n"
+        "ms = (time.perf_counter() - t) * 1000\n"
+        f"print(json.dumps([ms, [m for m in {MODULOS_PESADOS!r} if m in sys.modules]]))\n"
+    )
+    tiempos, cargados = [], []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True, cwd=RAIZ)
+        ms, cargados = json.loads(salida.stdout.strip().splitlines()[-1])
+        tiempos.append(ms)
+    return statistics.median(tiempos), cargados
+
+
+def correr_hijo(args):
+    # Proceso nuevo por escenario: los cache_resource de la app arrancan vacíos
+    import almacenamiento
+    from almacenamiento import ENCABEZADOS_DB, BackendGoogleSheets
+    from benchmarks.fake_gspread import FakeClient
+    from benchmarks.generador import generar_filas
+    from datos_stock import construir_foto_stock, deduplicar_movimientos, guardar_foto_stock, procesar_filas
+    from instrumentacion import INSTRUMENTACION
+    from streamlit.testing.v1 import AppTest
+
+    carpeta = tempfile.mkdtemp()
+    filas = generar_filas(args.filas)
+    os.environ.update({
+        "STOCK_BACKEND": "sqlite",  # la configuración; el backend lo arma crear_backend_lento
+        "STOCK_CATALOGO_PATH": os.path.join(carpeta, "catalogo.csv"),
+        "STOCK_JOURNAL_PATH": os.path.join(carpeta, "cola.jsonl"),
+        "STOCK_ARCHIVO_PATH": os.path.join(carpeta, "archivo"),
+        "STOCK_ALERTAS_PATH": os.path.join(carpeta, "alertas.json"),
+        "STOCK_FOTO_PATH": os.path.join(carpeta, "foto.csv"),
+    })
+    if args.con_foto:
+        df, _ = deduplicar_movimientos(procesar_filas(ENCABEZADOS_DB, filas), set())
+        guardar_foto_stock(construir_foto_stock(df), os.environ["STOCK_FOTO_PATH"])
+
+    def crear_backend_lento(config, client=None):
+        time.sleep(args.autorizacion)  # importar google.auth + autorizar
+        backend = BackendGoogleSheets(FakeClient([list(ENCABEZADOS_DB)] + filas, latencia=args.latencia))
+        backend.preparar()
+        return backend
+    almacenamiento.crear_backend = crear_backend_lento
+
+    resultado = {}
+    for corrida in ("fria", "caliente"):
+        INSTRUMENTACION.eventos.clear()
+        app = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=300)
+        inicio = time.perf_counter()
+        app.run()
+        total = time.perf_counter() - inicio
+        assert not app.exception, [e.value for e in app.exception]
+        marcas = [e for e in INSTRUMENTACION.eventos if e['tipo'] == 'marca' and e['nombre'] == 'primer_dibujo']
+        resultado[corrida] = {'primer_dibujo_ms': round(marcas[-1]['segundos'] * 1000, 1),
+                              'total_ms': round(total * 1000, 1)}
+    print(json.dumps(resultado))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arranque en frío y primer dibujo de la app")
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--autorizacion", type=float, default=1.5, help="segundos simulados de autorización")
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos por pedido a la hoja falsa")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--con-foto", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.hijo:
+        correr_hijo(args)
+        sys.exit()
+
+    print("--- Importación (intérprete nuevo, después de streamlit y pandas) ---")
+    ms, cargados = medir_importacion(MODULOS_APP)
+    print(f"módulos de la app          {ms:8.0f} ms  pesados cargados: {', '.join(cargados) or 'ninguno'}")
+    ms, cargados = medir_importacion(MODULOS_GOOGLE_ANTES)
+    print(f"imports Google de antes    {ms:8.0f} ms  ({', '.join(cargados)})")
+
+    print(f"--- Primer dibujo ({args.filas} filas, autorización {args.autorizacion}s, "
+          f"{args.latencia}s por pedido) ---")
+    for con_foto in (False, True):
+        comando = [sys.executable, os.path.abspath(__file__), "--hijo", "--filas", str(args.filas),
+                   "--autorizacion", str(args.autorizacion), "--latencia", str(args.latencia)]
+        if con_foto:
+            comando.append("--con-foto")
+        salida = subprocess.run(comando, capture_output=True, text=True, cwd=RAIZ)
+        if salida.returncode != 0:
+            print(salida.stderr)
+            sys.exit(1)
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        escenario = "con foto guardada" if con_foto else "sin foto guardada"
+        for corrida, r in resultado.items():
+            print(f"{escenario:<18} {corrida:<9} primer dibujo {r['primer_dibujo_ms']:8.0f} ms   "
+                  f"rerun completo {r['total_ms']:8.0f} ms")
@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ENCABEZADOS_DB
+from cliente_sheets import ClienteSheetsLimitado, LimitadorTokens
+from benchmarks.fake_gspread import FakeAPIError, FakeClient
+
+# Simula un cambio de turno: varias sesiones leen la hoja a la vez y la API
+# responde con errores de cuota. Muestra reintentos, esperas y lecturas juntadas.
+# Uso: python benchmarks/bench_cliente_limitado.py [sesiones]
+
+
+def simular(sesiones):
+    fake = FakeClient([ENCABEZADOS_DB] + [['KYD 6200K', '2024-01-01 10:00:00', '100', 'Materias Primas']] * 100,
+                      latencia=0.05)
+    pausas = []
+    # Cuota alta: acá interesan los errores de la API, el límite se mide en verificar_cuota
+    client = ClienteSheetsLimitado(fake, pedidos_por_minuto=6000, espera_base=0.01,
+                                   dormir=lambda s: pausas.append(s) or time.sleep(min(s, 0.01)))
+    libro = client.open("Base de Datos Fábrica")
+    # sheet1 también es un pedido (metadata del libro): un 429 ahí se reintenta
+    fake.inyectar_errores([429])
+    hoja = libro.sheet1
+    assert client.metricas['reintentos'] == 1 and fake.llamadas['sheet1'] == 2
+    fake.reiniciar_contadores()
+    fake.inyectar_errores([429, 503])
+
+    resultados = []
+    def leer():
+        resultados.append(len(hoja.get_all_values()))
+
+    hilos = [threading.Thread(target=leer) for _ in range(sesiones)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    # Un error que no es de cuota se propaga sin reintentos
+    fake.inyectar_errores([403])
+    try:
+        hoja.append_rows([['X', '2024-01-02 10:00:00', '1', 'P']])
+    except FakeAPIError as e:
+        print(f"Error no reintentable propagado: {e}")
+
+    print(f"{sesiones} sesiones leyeron {set(resultados)} filas con {fake.llamadas['get_all_values']} pedidos reales")
+    print(f"Métricas: {client.metricas}")
+
+
+def verificar_cuota(por_minuto=60):
+    # Con un reloj simulado y el balde lleno: en el primer minuto no se pasa de la cuota
+    reloj = [0.0]
+    limitador = LimitadorTokens(por_minuto, reloj=lambda: reloj[0],
+                                dormir=lambda s: reloj.__setitem__(0, reloj[0] + s))
+    en_el_minuto = 0
+    while True:
+        limitador.adquirir()
+        if reloj[0] >= 60:
+            break
+        en_el_minuto += 1
+    assert en_el_minuto <= por_minuto, en_el_minuto
+    print(f"Cuota de {por_minuto}/min: {en_el_minuto} pedidos en el primer minuto")
+
+
+if __name__ == "__main__":
+    verificar_cuota()
+    simular(int(sys.argv[1]) if len(sys.argv) > 1 else 8)
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ENCABEZADOS_DB, BackendGoogleSheets
+from datos_stock import guardar_dato_gsheet, guardar_lote
+from benchmarks.fake_gspread import FakeClient
+
+# Compara el guardado fila por fila (loop original de los botones "Guardar todas...")
+# contra el guardado en lote, contando pedidos a la API con un cliente falso.
+# Uso: python benchmarks/bench_guardado.py [cantidad_de_filas]
+
+
+def armar_editor(n):
+    return pd.DataFrame({
+        'descripcion': [f"Material {i}" for i in range(n)],
+        'planta': ['Materias Primas'] * n,
+        'Cantidad (kg)': [float(100 + i) for i in range(n)],
+    })
+
+
+def guardar_fila_por_fila(client, df_editado, col_cantidad):
+    # Reproduce el loop previo al guardado en lote
+    guardadas = 0
+    for _, fila in df_editado.iterrows():
+        if pd.isna(fila[col_cantidad]) or fila[col_cantidad] == "":
+            continue
+        nuevo_dato = {
+            "material_descripcion": fila["descripcion"],
+            "cantidad": fila[col_cantidad],
+            "fecha_hora": datetime.now(),
+            "planta": fila["planta"]
+        }
+        if guardar_dato_gsheet(client, nuevo_dato):
+            guardadas += 1
+    return guardadas
+
+
+def guardar_en_lote(client, df_editado, col_cantidad):
+    return guardar_lote(BackendGoogleSheets(client), df_editado, col_cantidad)
+
+
+def medir(nombre, funcion, n):
+    client = FakeClient([ENCABEZADOS_DB])
+    df = armar_editor(n)
+    inicio = time.perf_counter()
+    funcion(client, df, 'Cantidad (kg)')
+    segundos = time.perf_counter() - inicio
+    filas_escritas = len(client.hoja.filas) - 1
+    print(f"{nombre:<16} filas={filas_escritas:>5}  pedidos={client.pedidos:>5}  "
+          f"tiempo={segundos * 1000:8.1f} ms  {dict(client.llamadas)}")
+    return client.pedidos
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    print(f"Guardando {n} filas (sin contar la pausa fija de 2 s del loop original)")
+    antes = medir("fila por fila", guardar_fila_por_fila, n)
+    despues = medir("en lote", guardar_en_lote, n)
+    print(f"Reducción de pedidos: {antes} -> {despues} ({antes / max(despues, 1):.0f}x)")
@@ -0,0 +1,137 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import BackendGoogleSheets, BackendSQLite
+from catalogo import COLUMNAS_CATALOGO, Catalogo
+from importacion import importar_conteo
+from fake_gspread import FakeClient
+
+# Importación de una planilla de conteo grande (.xlsx y .csv) contra un catálogo
+# sintético del mismo tamaño: tiempo de la simulación y de la importación real
+# (SQLite y la hoja falsa, con sus pedidos a la API), y verificación de que cada
+# fila termine en el estado esperado.
+# Uso: python benchmarks/bench_importacion.py [filas]
+
+
+def armar_catalogo(n):
+    plantas = np.where(np.arange(n) % 2 == 0, 'Combet 1', 'Combet 2')
+    return Catalogo(pd.DataFrame({
+        'codigo': [f"M{i:06d}" for i in range(n)],
+        'descripcion': [f"Material {i}" for i in range(n)],
+        'tipo': np.where(np.arange(n) % 3 == 0, 'INSUMO', 'MATERIA PRIMA'),
+        'unidad': 'kg',
+        'planta': plantas,
+    }, columns=COLUMNAS_CATALOGO))
+
+
+def armar_conteo(n, semilla=0):
+    # -> (filas con encabezado, estado esperado por fila de datos)
+    rng = np.random.default_rng(semilla)
+    filas = [['Código', 'Descripción', 'Planta', 'Cantidad']]
+    esperado = []
+    for i in range(n):
+        cantidad = round(float(rng.integers(0, 500_000)) / 100, 2)
+        caso = rng.random()
+        if caso < 0.01:
+            filas.append([f"X{i}", '', '', cantidad]); esperado.append('error')  # código desconocido
+        elif caso < 0.02:
+            filas.append([f"M{i:06d}", '', '', 'n/d']); esperado.append('error')  # cantidad inválida
+        elif caso < 0.04:
+            filas.append([f"M{i:06d}", '', '', '']); esperado.append('omitido')
+        elif caso < 0.05 and i > 0 and filas[-1][0] == f"M{i - 1:06d}":
+            filas.append([f"M{i - 1:06d}", '', '', cantidad]); esperado.append('error')  # repetido
+        elif caso < 0.30:
+            # Por descripción y planta, en minúsculas y con coma decimal
+            planta = 'Combet 1' if i % 2 == 0 else 'Combet 2'
+            filas.append(['', f"material {i}", planta, f"{cantidad:.2f}".replace('.', ',')]); esperado.append('ok')
+        else:
+            filas.append([f"M{i:06d}", '', '', cantidad]); esperado.append('ok')
+    return filas, esperado
+
+
+def escribir_xlsx(ruta, filas):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    for fila in filas:
+        hoja.append(fila)
+    libro.save(ruta)
+
+
+def escribir_csv(ruta, filas):
+    pd.DataFrame(filas[1:], columns=filas[0]).to_csv(ruta, index=False, sep=';')
+
+
+def verificar(resultados, esperado, estado_ok):
+    obtenido = resultados['estado'].tolist()
+    assert len(obtenido) == len(esperado), (len(obtenido), len(esperado))
+    for fila, (o, e) in enumerate(zip(obtenido, esperado), start=2):
+        assert o == (estado_ok if e == 'ok' else e), (fila, o, e, resultados.iloc[fila - 2].to_dict())
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    catalogo = armar_catalogo(n)
+    filas, esperado = armar_conteo(n)
+    validas = esperado.count('ok')
+    fecha = datetime(2024, 5, 1, 10, 0)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for extension, escribir in (('xlsx', escribir_xlsx), ('csv', escribir_csv)):
+            ruta = os.path.join(carpeta, f"conteo.{extension}")
+            escribir(ruta, filas)
+
+            resultados, resumen = importar_conteo(ruta, catalogo, simular=True)
+            verificar(resultados, esperado, 'valido')
+            print(f"{extension:<5} simulación        {resumen['segundos'] * 1000:8.0f} ms  "
+                  f"{resumen.get('valido', 0)} válidas, {resumen.get('error', 0)} errores, "
+                  f"{resumen.get('omitido', 0)} omitidas")
+
+            backend = BackendSQLite(os.path.join(carpeta, f"stock_{extension}.db"))
+            resultados, resumen = importar_conteo(ruta, catalogo, backend.agregar_lote, fecha_hora=fecha)
+            verificar(resultados, esperado, 'importado')
+            escritas = backend.cargar_todo()[1]
+            assert len(escritas) == validas
+            print(f"{extension:<5} importación SQLite {resumen['segundos'] * 1000:7.0f} ms  "
+                  f"{resumen['lotes']} lotes")
+
+            # Reimportar el mismo conteo, en el mismo minuto y horas después: todo
+            # duplicado, nada escrito (los ids salen del archivo, no del reloj)
+            for demora in (timedelta(0), timedelta(minutes=3), timedelta(hours=5)):
+                resultados, resumen = importar_conteo(ruta, catalogo, backend.agregar_lote, fecha_hora=fecha + demora,
+                                                      ids_vistos={f[4] for f in escritas})
+                verificar(resultados, esperado, 'duplicado')
+                assert len(backend.cargar_todo()[1]) == validas and resumen['lotes'] == 0
+
+            # Falla a mitad de camino y se reimporta más tarde: sólo se escribe lo que faltaba
+            backend = BackendSQLite(os.path.join(carpeta, f"stock_{extension}_falla.db"))
+            lotes_escritos = []
+            def escribir_y_cortar(filas_lote):
+                if lotes_escritos:
+                    raise RuntimeError("corte de red")
+                lotes_escritos.append(len(filas_lote))
+                backend.agregar_lote(filas_lote)
+            _, resumen = importar_conteo(ruta, catalogo, escribir_y_cortar, fecha_hora=fecha, tam_lote=max(n // 4, 1))
+            assert resumen['error_escritura'] and len(backend.cargar_todo()[1]) == lotes_escritos[0]
+            resultados, resumen = importar_conteo(ruta, catalogo, backend.agregar_lote, fecha_hora=fecha + timedelta(minutes=3),
+                                                  ids_vistos={f[4] for f in backend.cargar_todo()[1]})
+            assert len(backend.cargar_todo()[1]) == validas
+            assert resumen.get('duplicado', 0) == lotes_escritos[0] and resumen['importado'] == validas - lotes_escritos[0]
+
+            client = FakeClient()
+            backend = BackendGoogleSheets(client)
+            client.reiniciar_contadores()
+            resultados, resumen = importar_conteo(ruta, catalogo, backend.agregar_lote)
+            verificar(resultados, esperado, 'importado')
+            assert len(client.hoja.filas) - 1 == validas
+            print(f"{extension:<5} importación Sheets {resumen['segundos'] * 1000:7.0f} ms  "
+                  f"{client.pedidos} pedidos")
+    print("OK")
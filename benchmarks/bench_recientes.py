@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ENCABEZADOS_DB, BackendGoogleSheets
+from datos_stock import movimientos_recientes
+from benchmarks.fake_gspread import FakeClient
+from benchmarks.verificar_reporte import armar_catalogo, armar_historial
+
+# Compara el "Historial Reciente" original (ordenar todo y tomar 50) contra
+# movimientos_recientes, y cuenta cuánto baja el inspector leyendo sólo la cola.
+# Uso: python benchmarks/bench_recientes.py [cantidad_de_movimientos]
+
+
+def medir(funcion, repeticiones=5):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) / repeticiones
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    catalogo = armar_catalogo(80)
+    df_stock = armar_historial(n, catalogo)
+    # Una pestaña con pocos materiales: el caso que más bloques recorre
+    descripciones = catalogo['descripcion'].iloc[:5]
+
+    esperado, t_orden = medir(lambda: df_stock[df_stock['material_codigo'].isin(descripciones)]
+                              .sort_values('fecha_hora', ascending=False).head(50))
+    obtenido, t_cola = medir(lambda: movimientos_recientes(df_stock, descripciones, 50))
+    pd.testing.assert_frame_equal(esperado, obtenido)
+    print(f"{n} movimientos: ordenar todo {t_orden * 1000:.1f} ms, recorrer la cola {t_cola * 1000:.2f} ms "
+          f"({t_orden / t_cola:.0f}x), mismas 50 filas")
+
+    filas = [[m, f"{f:%Y-%m-%d %H:%M:%S}", str(c), p, ''] for m, f, c, p in
+             zip(df_stock['material_codigo'].iloc[:100_000], df_stock['fecha_hora'],
+                 df_stock['cantidad'], df_stock['planta'])]
+    client = FakeClient([ENCABEZADOS_DB] + filas)
+    backend = BackendGoogleSheets(client)
+    backend.hoja
+    for nombre, leer in (("cargar_todo()[-5:]", lambda: backend.cargar_todo()[1][-5:]),
+                         ("ultimas(5)", lambda: backend.ultimas(5)[1]),
+                         ("ultimas(5, total)", lambda: backend.ultimas(5, len(filas))[1])):
+        client.reiniciar_contadores()
+        ultimas = leer()
+        assert ultimas == filas[-5:], nombre
+        print(f"inspector con {nombre:<20} pedidos={client.pedidos}  celdas bajadas={client.celdas_leidas:>7}  "
+              f"{dict(client.llamadas)}")
@@ -0,0 +1,187 @@
+import re
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+# Cliente gspread falso, en memoria, para medir la app sin tocar Google Sheets.
+# Cada método cuenta los pedidos HTTP que haría el cliente real (y las celdas
+# que bajarían), así los benchmarks pueden comparar viajes de ida y vuelta entre
+# implementaciones.
+# También puede simular errores de cuota (429) o del servidor (5xx).
+
+
+class FakeAPIError(Exception):
+    # Imita gspread.exceptions.APIError: expone .code y .response.status_code
+    def __init__(self, codigo):
+        super().__init__(f"APIError [{codigo}]")
+        self.code = codigo
+        self.response = SimpleNamespace(status_code=codigo)
+
+
+def _col_a_indice(letras):
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + (ord(letra) - ord('A') + 1)
+    return indice
+
+
+def _parsear_rango(rango):
+    # Devuelve (fila_ini, fila_fin, col_ini, col_fin), 1-based; None = sin límite
+    m = re.fullmatch(r"([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?", rango.split('!')[-1])
+    if not m:
+        raise ValueError(f"Rango no soportado: {rango}")
+    col_ini, fila_ini, col_fin, fila_fin = m.groups()
+    if m.group(0).find(':') == -1:
+        col_fin, fila_fin = col_ini, fila_ini
+    return (
+        int(fila_ini) if fila_ini else 1,
+        int(fila_fin) if fila_fin else None,
+        _col_a_indice(col_ini) if col_ini else 1,
+        _col_a_indice(col_fin) if col_fin else None,
+    )
+
+
+def _recortar(filas):
+    # La API omite celdas vacías al final de cada fila y filas vacías al final
+    filas = [list(f) for f in filas]
+    for f in filas:
+        while f and f[-1] == '':
+            f.pop()
+    while filas and not filas[-1]:
+        filas.pop()
+    return filas
+
+
+class FakeWorksheet:
+    def __init__(self, cliente, filas):
+        self._cliente = cliente
+        self.filas = filas
+
+    def _pedido(self, metodo):
+        self._cliente.registrar(metodo)
+
+    @property
+    def row_count(self):
+        # En gspread viene de la metadata ya descargada: no genera pedido
+        return len(self.filas)
+
+    def _leer(self, rango):
+        fila_ini, fila_fin, col_ini, col_fin = _parsear_rango(rango)
+        fila_fin = fila_fin or len(self.filas)
+        salida = []
+        for fila in self.filas[fila_ini - 1:fila_fin]:
+            salida.append(fila[col_ini - 1:col_fin] if col_fin else fila[col_ini - 1:])
+        return self._cliente.bajadas(_recortar(salida))
+
+    def get_all_values(self):
+        self._pedido('get_all_values')
+        ancho = max((len(f) for f in self.filas), default=0)
+        datos = [list(f) + [''] * (ancho - len(f)) for f in self.filas]
+        while datos and not any(datos[-1]):
+            datos.pop()
+        return self._cliente.bajadas(datos)
+
+    def get(self, rango):
+        self._pedido('get')
+        return self._leer(rango)
+
+    def batch_get(self, rangos):
+        self._pedido('batch_get')
+        return [self._leer(r) for r in rangos]
+
+    def row_values(self, fila):
+        self._pedido('row_values')
+        datos = self._leer(f"{fila}:{fila}")
+        return datos[0] if datos else []
+
+    def col_values(self, col):
+        self._pedido('col_values')
+        valores = [f[col - 1] if len(f) >= col else '' for f in self.filas]
+        self._cliente.celdas_leidas += len(valores)
+        return valores
+
+    def acell(self, a1):
+        self._pedido('acell')
+        datos = self._leer(a1)
+        return SimpleNamespace(value=datos[0][0] if datos and datos[0] else None)
+
+    def update_acell(self, a1, valor):
+        self._pedido('update_acell')
+        fila, _, col, _ = _parsear_rango(a1)
+        while len(self.filas) < fila:
+            self.filas.append([])
+        actual = self.filas[fila - 1]
+        actual += [''] * (col - len(actual))
+        actual[col - 1] = str(valor)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._pedido('update')
+        fila_ini, _, col_ini, _ = _parsear_rango(range_name or "A1")
+        for desplazamiento, valores in enumerate(values):
+            fila = fila_ini + desplazamiento
+            while len(self.filas) < fila:
+                self.filas.append([])
+            actual = self.filas[fila - 1]
+            actual += [''] * (col_ini - 1 + len(valores) - len(actual))
+            actual[col_ini - 1:col_ini - 1 + len(valores)] = [str(v) for v in valores]
+
+    def append_row(self, fila, **kwargs):
+        self._pedido('append_row')
+        self.filas.append([str(v) for v in fila])
+
+    def append_rows(self, filas, **kwargs):
+        self._pedido('append_rows')
+        self.filas.extend([str(v) for v in f] for f in filas)
+
+    def delete_rows(self, inicio, fin=None):
+        self._pedido('delete_rows')
+        del self.filas[inicio - 1:(fin or inicio)]
+
+
+class FakeSpreadsheet:
+    def __init__(self, cliente, hoja):
+        self._cliente = cliente
+        self._hoja = hoja
+
+    @property
+    def sheet1(self):
+        # Como gspread 6: get_worksheet(0) vuelve a pedir la metadata del libro
+        self._cliente.registrar('sheet1')
+        return self._hoja
+
+
+class FakeClient:
+    def __init__(self, filas=None, latencia=0.0):
+        self.llamadas = Counter()
+        self.celdas_leidas = 0
+        self.latencia = latencia
+        self.errores_pendientes = []
+        self.hoja = FakeWorksheet(self, [list(map(str, f)) for f in (filas or [])])
+
+    def inyectar_errores(self, codigos):
+        # Los próximos pedidos fallan con estos códigos HTTP, en orden
+        self.errores_pendientes.extend(codigos)
+
+    def registrar(self, metodo, pedidos=1):
+        self.llamadas[metodo] += pedidos
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.errores_pendientes:
+            raise FakeAPIError(self.errores_pendientes.pop(0))
+
+    def bajadas(self, filas):
+        self.celdas_leidas += sum(len(f) for f in filas)
+        return filas
+
+    @property
+    def pedidos(self):
+        return sum(self.llamadas.values())
+
+    def reiniciar_contadores(self):
+        self.llamadas.clear()
+        self.celdas_leidas = 0
+
+    def open(self, nombre):
+        # gspread.Client.open busca el archivo en Drive y luego baja la metadata
+        self.registrar('open', 2)
+        return FakeSpreadsheet(self, self.hoja)
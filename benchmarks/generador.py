@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ENCABEZADOS_DB
+from catalogo import CATALOGO_INICIAL
+
+# Historial sintético con la misma forma que la hoja "Base de Datos Fábrica":
+# filas de texto, fechas ISO mezcladas con fechas día/mes de carga manual,
+# cantidades con coma decimal y un porcentaje de filas rotas. Usa todos los
+# materiales del catálogo original, cada uno con su planta.
+# Uso: python benchmarks/generador.py 100000 [salida.csv]
+
+FORMATO_ISO = "%Y-%m-%d %H:%M:%S"
+FORMATO_DIA_PRIMERO = "%d/%m/%Y %H:%M"
+
+
+def generar_filas(n, semilla=0, inicio='2020-01-01', dias=730,
+                  dia_primero=0.2, coma_decimal=0.3, rotas=0.01, con_id=0.5):
+    # -> lista de filas crudas [material, fecha, cantidad, planta, id_movimiento]
+    rng = np.random.default_rng(semilla)
+    catalogo = pd.DataFrame(CATALOGO_INICIAL)
+    elegidos = rng.integers(0, len(catalogo), n)
+    materiales = catalogo['descripcion'].to_numpy()[elegidos]
+    plantas = catalogo['planta'].to_numpy()[elegidos]
+
+    # Fechas ordenadas, como se cargan, con segundos al azar
+    segundos = np.sort(rng.integers(0, dias * 86400, n))
+    fechas = pd.Timestamp(inicio) + pd.to_timedelta(segundos, unit='s')
+    textos_fecha = np.where(
+        rng.random(n) < dia_primero,
+        fechas.strftime(FORMATO_DIA_PRIMERO),
+        fechas.strftime(FORMATO_ISO),
+    )
+
+    cantidades = rng.integers(0, 400_000, n) / 100
+    textos_cantidad = np.char.mod('%.2f', cantidades)
+    con_coma = rng.random(n) < coma_decimal
+    textos_cantidad[con_coma] = np.char.replace(textos_cantidad[con_coma], '.', ',')
+
+    # Filas rotas: mitad con fecha ilegible, mitad con cantidad vacía o no numérica
+    rotas_idx = np.flatnonzero(rng.random(n) < rotas)
+    mitad = len(rotas_idx) // 2
+    textos_fecha = textos_fecha.astype(object)
+    textos_cantidad = textos_cantidad.astype(object)
+    textos_fecha[rotas_idx[:mitad]] = 'sin fecha'
+    textos_cantidad[rotas_idx[mitad:]] = rng.choice(['', 'n/d', '12kg'], len(rotas_idx) - mitad)
+
+    ids = np.where(rng.random(n) < con_id, [f"{i:016x}" for i in range(n)], '')
+    return [list(f) for f in zip(materiales, textos_fecha, textos_cantidad, plantas, ids)]
+
+
+def catalogo_por_tipo(tipo):
+    catalogo = pd.DataFrame(CATALOGO_INICIAL)
+    return catalogo[catalogo['tipo'] == tipo]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    salida = sys.argv[2] if len(sys.argv) > 2 else f"historial_{n}.csv"
+    pd.DataFrame(generar_filas(n), columns=ENCABEZADOS_DB).to_csv(salida, index=False)
+    print(f"{n} movimientos sintéticos en {salida}")
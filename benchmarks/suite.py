@@ -0,0 +1,187 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ENCABEZADOS_DB, BackendGoogleSheets
+from cola_escritura import ColaEscritura
+from datos_stock import (
+    cargar_y_procesar_datos,
+    calcular_consumo_diario,
+    calcular_reporte_stock,
+    construir_foto_stock,
+    encolar_lote,
+    guardar_lote,
+    nuevo_cache_sincronizacion,
+    sincronizar_datos,
+)
+from benchmarks.bench_guardado import guardar_fila_por_fila
+from benchmarks.fake_gspread import FakeClient
+from benchmarks.generador import catalogo_por_tipo, generar_filas
+from benchmarks.verificar_reporte import reporte_por_material
+
+# Suite de rendimiento de los caminos de carga, consumo, reportes y guardado,
+# contra el cliente gspread falso. Por cada camino y tamaño de historial anota
+# tiempo, pico de memoria (tracemalloc) y pedidos a la API, y escribe todo en un
+# JSON para comparar versiones. tracemalloc hace mucho más lentos los caminos
+# con loops en Python, así que la memoria se mide en una segunda pasada con los
+# mismos datos y los tiempos salen de la primera.
+# Uso: python benchmarks/suite.py --tamanios 10000,100000,1000000 --salida resultados.json
+# (5M filas necesitan unos 8 GB de RAM: la hoja falsa guarda todo como texto)
+
+
+def armar_cliente(filas):
+    client = FakeClient()
+    # Sin copiar: con millones de filas la copia duplica la memoria
+    client.hoja.filas = [list(ENCABEZADOS_DB)] + filas
+    return client
+
+
+def armar_editor(catalogo, columna):
+    editor = catalogo[['descripcion', 'planta']].copy()
+    editor[columna] = np.arange(len(editor), dtype=float) * 10 + 100
+    return editor
+
+
+class Medidor:
+    def __init__(self):
+        self.resultados = []
+        self.midiendo_memoria = False
+        self._picos = {}
+
+    def medir(self, camino, filas, funcion, client=None):
+        gc.collect()
+        if self.midiendo_memoria:
+            tracemalloc.start()
+            resultado = funcion()
+            self._picos[(camino, filas)] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return resultado
+
+        pedidos_antes = client.pedidos if client is not None else 0
+        inicio = time.perf_counter()
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+        self.resultados.append({
+            'camino': camino,
+            'filas': filas,
+            'segundos': round(segundos, 6),
+            'pico_memoria_mb': None,
+            'pedidos': (client.pedidos - pedidos_antes) if client is not None else 0,
+        })
+        return resultado
+
+    def imprimir(self, desde=0):
+        for registro in self.resultados[desde:]:
+            pico = self._picos.get((registro['camino'], registro['filas']))
+            if pico is not None:
+                registro['pico_memoria_mb'] = round(pico / 1e6, 3)
+            memoria = f"{registro['pico_memoria_mb']:9.1f} MB" if pico is not None else "        -"
+            print(f"{registro['camino']:<28} filas={registro['filas']:>8}  "
+                  f"{registro['segundos'] * 1000:10.1f} ms  {memoria}  pedidos={registro['pedidos']}")
+
+
+def correr_tamanio(medidor, n, semilla):
+    filas = generar_filas(n, semilla=semilla)
+    materias = catalogo_por_tipo('MATERIA PRIMA')
+    insumos = catalogo_por_tipo('INSUMO')
+
+    # --- Carga ---
+    client = armar_cliente(filas)
+    medidor.medir('carga_completa_legada', n, lambda: cargar_y_procesar_datos(client), client)
+    backend = BackendGoogleSheets(client)
+    cache = nuevo_cache_sincronizacion()
+    df = medidor.medir('sincronizacion_completa', n, lambda: sincronizar_datos(backend, cache), client)
+    cache["df"] = df
+    cache["resync_en"] = time.time()
+    nuevas = generar_filas(max(1, n // 100), semilla=semilla + 1, inicio='2022-01-01', dias=7)
+    client.hoja.filas.extend(nuevas)
+    df = medidor.medir('sincronizacion_incremental', len(nuevas), lambda: sincronizar_datos(backend, cache), client)
+    cache["df"] = df
+
+    # --- Consumo ---
+    def consumo_por_material():
+        return {desc: calcular_consumo_diario(df[df['material_codigo'] == desc].sort_values('fecha_hora'))
+                for desc in pd.concat([materias, insumos])['descripcion'].unique()}
+    medidor.medir('consumo_loop_por_material', len(df), consumo_por_material)
+    medidor.medir('foto_stock_completa', len(df), lambda: construir_foto_stock(df))
+
+    # --- Reportes por pestaña ---
+    ahora = datetime(2022, 1, 10)
+    foto = cache["foto_stock"]
+    for nombre, catalogo in (('mp', materias), ('insumos', insumos)):
+        medidor.medir(f'reporte_{nombre}_loop', len(df), lambda: reporte_por_material(df, catalogo, ahora))
+        medidor.medir(f'reporte_{nombre}_vectorizado', len(df), lambda: calcular_reporte_stock(df, catalogo, ahora))
+        medidor.medir(f'reporte_{nombre}_foto', len(df), lambda: calcular_reporte_stock(df, catalogo, ahora, foto=foto))
+
+    # --- Guardado (pestaña de materias primas completa) ---
+    editor = armar_editor(materias, 'Cantidad (kg)')
+    medidor.medir('guardado_fila_por_fila', len(editor),
+                  lambda: guardar_fila_por_fila(client, editor, 'Cantidad (kg)'), client)
+    medidor.medir('guardado_lote', len(editor),
+                  lambda: guardar_lote(BackendGoogleSheets(client), editor, 'Cantidad (kg)'), client)
+    with tempfile.TemporaryDirectory() as carpeta:
+        cola = ColaEscritura(BackendGoogleSheets(client), os.path.join(carpeta, "cola.jsonl"))
+        medidor.medir('guardado_encolar', len(editor),
+                      lambda: encolar_lote(cola, editor, 'Cantidad (kg)'), client)
+        medidor.medir('guardado_cola_hasta_vaciar', len(editor), lambda: cola.esperar_vacia(60), client)
+
+    lectura = cache["lectura"]
+    return {
+        'filas': n,
+        'filas_descartadas': lectura.get('filas_descartadas', 0),
+        'formatos_fecha': lectura.get('formatos_fecha', {}),
+    }
+
+
+def version_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suite de rendimiento de Control de Stock")
+    parser.add_argument("--tamanios", default="10000,100000,1000000")
+    parser.add_argument("--salida", default="resultados_benchmark.json")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--sin-memoria", action="store_true", help="saltear la pasada de memoria")
+    args = parser.parse_args()
+
+    medidor = Medidor()
+    datos = []
+    for n in [int(t) for t in args.tamanios.split(",")]:
+        print(f"--- {n} filas ---")
+        desde = len(medidor.resultados)
+        datos.append(correr_tamanio(medidor, n, args.semilla))
+        if not args.sin_memoria:
+            medidor.midiendo_memoria = True
+            correr_tamanio(medidor, n, args.semilla)
+            medidor.midiendo_memoria = False
+        medidor.imprimir(desde)
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'version': version_git(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'memoria_medida': not args.sin_memoria,
+            'datos': datos,
+            'resultados': medidor.resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {args.salida}")
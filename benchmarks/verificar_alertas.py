@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alertas import UMBRALES_POR_DEFECTO, evaluar
+from almacenamiento import BackendGoogleSheets, ENCABEZADOS_DB
+from catalogo import CATALOGO_INICIAL, Catalogo
+from datos_stock import calcular_reporte_stock, nuevo_cache_sincronizacion
+from fake_gspread import FakeClient
+from generador import generar_filas
+
+# Verifica el evaluador de alertas: con los umbrales por defecto da las mismas
+# alertas que la regla fija de la página (15 días materias primas, 30 insumos),
+# los umbrales por planta y por material ganan sobre los del tipo, y entre dos
+# corridas el estado marca bien las nuevas, resueltas y las que siguen.
+# Uso: python benchmarks/verificar_alertas.py [cantidad_de_movimientos]
+
+
+def alertas_regla_fija(df, catalogo, ahora):
+    # Lo que mostraban las pestañas antes del evaluador. Se compara por descripción:
+    # el stock es por descripción y la regla fija mostraba sólo la primera fila de
+    # las repetidas (los Master de Combet 1 y 2); el evaluador alerta las dos.
+    descripciones = set()
+    for tipo, limite in (('MATERIA PRIMA', 15), ('INSUMO', 30)):
+        reporte = calcular_reporte_stock(df, catalogo[catalogo['tipo'] == tipo], ahora)
+        dias = reporte['Días Restantes']
+        descripciones |= set(reporte.loc[(dias != np.inf) & (dias <= limite), 'Descripción'])
+    return descripciones
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    ahora = datetime(2022, 1, 10)
+    catalogo = Catalogo(pd.DataFrame(CATALOGO_INICIAL))
+    client = FakeClient()
+    client.hoja.filas = [list(ENCABEZADOS_DB)] + generar_filas(n)
+    backend = BackendGoogleSheets(client)
+    cache = nuevo_cache_sincronizacion()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_estado = os.path.join(carpeta, "alertas_estado.json")
+        ruta_cola = os.path.join(carpeta, "eventos.jsonl")
+
+        # 1) Umbrales por defecto = regla fija
+        estado = evaluar(backend, cache, catalogo, UMBRALES_POR_DEFECTO, ruta_estado, ruta_cola, ahora)
+        activas = {a['codigo'] for a in estado['activas']}
+        esperadas = alertas_regla_fija(cache["df"], catalogo.df, ahora)
+        descripciones = {a['descripcion'] for a in estado['activas']}
+        assert descripciones == esperadas, (descripciones ^ esperadas)
+        repetidas = catalogo.df[catalogo.df['descripcion'].isin(descripciones)]
+        assert activas == set(repetidas['codigo']), "falta algún código de una descripción repetida"
+        assert set(estado['nuevas']) == activas and not estado['resueltas']
+        print(f"Umbrales por defecto: {len(activas)} alertas, iguales a la regla fija")
+
+        # 2) Por planta y por material, sobre un umbral por tipo mucho más bajo
+        dias = {a['codigo']: a['dias_restantes'] for a in estado['activas']}
+        silenciado = max(dias, key=dias.get)
+        planta = catalogo.por_codigo[silenciado]['planta']
+        umbrales = {'por_tipo': {'MATERIA PRIMA': 1, 'INSUMO': 1},
+                    'por_planta': {planta: 10_000},
+                    'por_material': {silenciado: 0}}
+        pedidos_antes = client.pedidos
+        estado = evaluar(backend, cache, catalogo, umbrales, ruta_estado, ruta_cola, ahora)
+        assert client.pedidos - pedidos_antes <= 2, "la segunda corrida no fue incremental"
+        activas2 = {a['codigo'] for a in estado['activas']}
+        esperadas2 = {c for c, d in dias.items()
+                      if c != silenciado and (catalogo.por_codigo[c]['planta'] == planta or d <= 1)}
+        assert silenciado not in activas2, "el umbral por material no ganó"
+        assert activas2 == esperadas2, (activas2 ^ esperadas2)
+        assert set(estado['resueltas']) == activas - activas2
+        assert set(estado['nuevas']) == activas2 - activas
+        assert set(estado['siguen']) == activas2 & activas
+        primera = json.load(open(ruta_estado, encoding='utf-8'))
+        assert all(a['desde'] == ahora.isoformat(timespec='seconds')
+                   for a in primera['activas'] if a['codigo'] in activas)
+        print(f"Por planta ({planta}) y por material ({silenciado}): "
+              f"{len(estado['nuevas'])} nuevas, {len(estado['resueltas'])} resueltas, {len(estado['siguen'])} siguen")
+
+        with open(ruta_cola, encoding='utf-8') as f:
+            eventos = [json.loads(linea) for linea in f]
+        assert len(eventos) == len(activas) + len(estado['nuevas']) + len(estado['resueltas'])
+        print(f"Cola: {len(eventos)} eventos")
+    print("OK")
@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import BackendGoogleSheets, BackendSQLite, ENCABEZADOS_DB
+from archivo_historial import archivar_historial, cargar_archivo, leer_resumen
+from datos_stock import calcular_reporte_stock, construir_foto_stock, procesar_filas, deduplicar_movimientos
+from fake_gspread import FakeClient
+from verificar_foto_stock import comparar_fotos
+from verificar_reporte import armar_catalogo, armar_historial, comparar, reporte_por_material
+
+# Verifica el archivado: después de cada corrida, la foto armada con la hoja
+# compactada más el resumen del archivo tiene que coincidir con la de la
+# historia completa (y con el loop original de los reportes), y archivo + hoja
+# tienen que contener exactamente los movimientos originales.
+# Uso: python benchmarks/verificar_archivo.py [cantidad_de_movimientos]
+
+
+def filas_crudas(historial):
+    return [
+        [m, f"{f:%Y-%m-%d %H:%M:%S}", f"{c:g}".replace('.', ','), p, '']
+        for m, f, c, p in zip(historial['material_codigo'], historial['fecha_hora'],
+                              historial['cantidad'], historial['planta'])
+    ]
+
+
+def cargar(backend):
+    encabezados, filas = backend.cargar_todo()
+    df, _ = deduplicar_movimientos(procesar_filas(encabezados, filas), set())
+    return df
+
+
+def verificar(backend, ruta, catalogo, completo, ahora):
+    vivo = cargar(backend)
+    foto = construir_foto_stock(vivo, leer_resumen(ruta))
+    comparar_fotos(construir_foto_stock(completo), foto)
+    comparar(reporte_por_material(completo, catalogo, ahora),
+             calcular_reporte_stock(vivo, catalogo, ahora, foto=foto))
+    archivado = cargar_archivo(ruta)
+    ids = pd.concat([archivado['id_movimiento'], vivo['id_movimiento']])
+    assert not ids.duplicated().any(), "movimientos repetidos entre archivo y hoja"
+    assert set(ids) == set(completo['id_movimiento']), "faltan movimientos"
+    return len(vivo), len(archivado)
+
+
+def probar(nombre, backend, n, ahora):
+    catalogo = armar_catalogo(80)
+    historial = armar_historial(n, catalogo)
+    # Estiramos las fechas para cubrir dos años, cualquiera sea n
+    origen = pd.Timestamp('2020-01-01')
+    escala = pd.Timedelta(days=730) / (historial['fecha_hora'].max() - origen)
+    historial['fecha_hora'] = (origen + (historial['fecha_hora'] - origen) * escala).dt.floor('s')
+    backend.agregar_lote(filas_crudas(historial))
+    completo = cargar(backend)
+
+    with tempfile.TemporaryDirectory() as ruta:
+        for horizonte in (365, 90):
+            inicio = time.perf_counter()
+            resultado = archivar_historial(backend, ruta, horizonte, ahora)
+            segundos = time.perf_counter() - inicio
+            vivas, archivadas = verificar(backend, ruta, catalogo, completo, ahora)
+            print(f"{nombre}, horizonte {horizonte} días: {resultado['eliminadas']} filas fuera de la hoja "
+                  f"en {segundos:.2f} s; quedan {vivas} en la hoja y {archivadas} en el archivo; reporte igual")
+
+        # Lectura perezosa: sólo las particiones del rango pedido
+        desde, hasta = pd.Timestamp('2020-02-01'), pd.Timestamp('2020-03-01')
+        parcial = cargar_archivo(ruta, desde, hasta)
+        esperado = completo[(completo['fecha_hora'] >= desde) & (completo['fecha_hora'] < hasta)]
+        assert len(parcial) <= len(esperado) and parcial['fecha_hora'].between(desde, hasta).all()
+        print(f"{nombre}: consulta de febrero 2020 -> {len(parcial)} movimientos archivados")
+    return backend
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    ahora = datetime(2022, 1, 2)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        sqlite = probar("SQLite", BackendSQLite(os.path.join(carpeta, "stock.db")), n, ahora)
+        ids = [f[0] for f in sqlite._consultar("SELECT id FROM movimientos ORDER BY id")]
+        assert ids == list(range(1, len(ids) + 1)), "el id dejó de ser la posición + 1"
+
+    client = FakeClient([ENCABEZADOS_DB])
+    probar("Google Sheets (falso)", BackendGoogleSheets(client), n, ahora)
+    print(f"Google Sheets (falso): pedidos {dict(client.llamadas)}")
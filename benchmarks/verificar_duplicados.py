@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ENCABEZADOS_DB, BackendGoogleSheets, BackendSQLite
+from cola_escritura import ColaEscritura
+from datos_stock import (calcular_consumo_diario, encolar_lote, guardar_lote,
+                         nuevo_cache_sincronizacion, preparar_lote, sincronizar_datos)
+from benchmarks.fake_gspread import FakeClient
+
+# Reenvía el mismo lote varias veces (doble clic, reintentos, rerun tras falla
+# parcial) por cada camino de escritura y verifica que quede una sola copia,
+# tanto al escribir como al leer. Los reenvíos cruzan el cambio de minuto y llegan
+# horas después, con el mismo token por fila que arma la app (origenes_envio).
+# Las mismas verificaciones corren con pytest (tests/test_duplicados.py).
+# Uso: python benchmarks/verificar_duplicados.py [repeticiones]
+
+# Momentos de cada reenvío: doble clic en el cambio de minuto, reintentos más tarde
+MOMENTOS = [datetime(2024, 3, 1, 10, 15, 59), datetime(2024, 3, 1, 10, 16, 0),
+            datetime(2024, 3, 1, 10, 16, 30), datetime(2024, 3, 1, 10, 45, 0), datetime(2024, 3, 1, 13, 0, 0)]
+
+
+def lote():
+    return pd.DataFrame({
+        'descripcion': ['KYD 6200K', 'LYD 6200K', 'Diluyente'],
+        'planta': ['Materias Primas', 'Materias Primas', 'Combet 2'],
+        'Cantidad': [1200.5, 800.0, None],
+    })
+
+
+def origenes():
+    # Lo que guarda la sesión de la app para cada fila mientras la cantidad no cambia
+    return pd.Series(['tok-kyd', 'tok-lyd', 'tok-dil'], dtype=object)
+
+
+def momento(i):
+    return MOMENTOS[i % len(MOMENTOS)] + timedelta(days=i // len(MOMENTOS))
+
+
+def verificar_backend(nombre, backend, repeticiones):
+    cache = nuevo_cache_sincronizacion()
+    for i in range(repeticiones):
+        resultado = guardar_lote(backend, lote(), 'Cantidad', momento(i),
+                                 ids_vistos=cache["ids_vistos"], origen=origenes())
+        cache["df"] = sincronizar_datos(backend, cache)
+        if i > 0:
+            assert set(resultado['estado']) == {'duplicado', 'omitido'}, resultado
+    _, filas = backend.cargar_todo()
+    assert len(filas) == 2, filas
+    assert len(cache["df"]) == 2
+    print(f"{nombre}: {repeticiones} reenvíos -> {len(filas)} filas escritas")
+
+
+def verificar_reenvio_sqlite(repeticiones):
+    # El mismo lote directo al backend (sin la deduplicación de la app), con
+    # movimientos nuevos en el medio: los ids siguen siendo la posición + 1 y
+    # cada sincronización sigue siendo incremental
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = BackendSQLite(os.path.join(tmp, "stock.db"))
+        cache = nuevo_cache_sincronizacion()
+        fecha = datetime(2024, 3, 1, 10, 15, 0)
+        filas, _ = preparar_lote(lote(), 'Cantidad', fecha)
+        for i in range(repeticiones):
+            backend.agregar_lote(filas + filas)
+            backend.agregar_lote([['Diluyente', f'2024-03-0{i % 9 + 2} 08:00:00', '50', 'Combet 2']])
+            cache["df"] = sincronizar_datos(backend, cache)
+        ids = [v for (v,) in backend._con.execute("SELECT id FROM movimientos ORDER BY id")]
+        assert ids == list(range(1, 2 + repeticiones + 1)), ids
+        assert cache["resyncs"] == 0, cache["resyncs"]
+        print(f"SQLite directo: {repeticiones} reenvíos -> {len(ids)} filas, {cache['resyncs']} resincronizaciones")
+
+
+def verificar_cola(repeticiones):
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = BackendSQLite(os.path.join(tmp, "stock.db"))
+        cola = ColaEscritura(backend, os.path.join(tmp, "cola.jsonl"))
+        for i in range(repeticiones):
+            encolar_lote(cola, lote(), 'Cantidad', momento(i), origen=origenes())
+        cola.esperar_vacia(10)
+        _, filas = backend.cargar_todo()
+        assert len(filas) == 2, filas
+        print(f"Cola de escritura: {repeticiones} reenvíos -> {len(filas)} filas escritas")
+
+
+def verificar_ventana_sin_origen():
+    # Sin token (scripts) la ventana es el minuto: dentro del minuto es duplicado,
+    # al cruzar el cambio de minuto ya es otro movimiento
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = BackendSQLite(os.path.join(tmp, "stock.db"))
+        ids = set()
+        for fecha in (datetime(2024, 3, 1, 10, 15, 0), datetime(2024, 3, 1, 10, 15, 59), datetime(2024, 3, 1, 10, 16, 0)):
+            guardar_lote(backend, lote(), 'Cantidad', fecha, ids_vistos=ids)
+            ids.update(f[4] for f in backend.cargar_todo()[1])
+        _, filas = backend.cargar_todo()
+        assert len(filas) == 4, filas
+        print(f"Sin token: 10:15:00 y 10:15:59 -> una copia; 10:16:00 -> {len(filas) - 2} filas más")
+
+
+def verificar_lectura(repeticiones):
+    # Duplicados ya presentes en la hoja (escritos antes de los ids)
+    filas = [ENCABEZADOS_DB[:4]]
+    for _ in range(repeticiones):
+        filas.append(['KYD 6200K', '2024-03-15 10:15:00', '1000', 'Materias Primas'])
+    filas.append(['KYD 6200K', '2024-03-17 10:15:00', '1100', 'Materias Primas'])
+    cache = nuevo_cache_sincronizacion()
+    df = sincronizar_datos(BackendGoogleSheets(FakeClient(filas)), cache)
+    assert len(df) == 2 and cache["duplicados_descartados"] == repeticiones - 1
+    # Sin intervalos de 0 días, el consumo es el real: 100 kg en 2 días
+    assert calcular_consumo_diario(df) == 50
+    print(f"Lectura: {repeticiones} copias en la hoja -> {len(df)} movimientos, consumo {calcular_consumo_diario(df)}/día")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        verificar_backend("SQLite", BackendSQLite(os.path.join(tmp, "stock.db")), n)
+    verificar_backend("Google Sheets (falso)", BackendGoogleSheets(FakeClient()), n)
+    verificar_reenvio_sqlite(n)
+    verificar_cola(n)
+    verificar_ventana_sin_origen()
+    verificar_lectura(n)
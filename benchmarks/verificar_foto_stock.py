@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos_stock import actualizar_foto_stock, calcular_reporte_stock, construir_foto_stock
+from verificar_reporte import armar_catalogo, armar_historial, comparar, reporte_por_material
+
+# Verifica que la foto por material mantenida en forma incremental coincida con
+# la reconstrucción completa y con el loop original de los reportes
+# (calcular_consumo_diario por material). Simula sincronizaciones con tandas de
+# movimientos nuevos y una tanda final con movimientos atrasados.
+# Uso: python benchmarks/verificar_foto_stock.py [cantidad_de_movimientos]
+
+
+def unir(df_actual, df_nuevo):
+    # Igual que sincronizacion_incremental: sólo reordena si llegan filas atrasadas
+    df = pd.concat([df_actual, df_nuevo])
+    if df_nuevo['fecha_hora'].min() < df_actual['fecha_hora'].max():
+        df = df.sort_values('fecha_hora', kind='mergesort')
+    return df
+
+
+def comparar_fotos(esperada, obtenida):
+    obtenida = obtenida.loc[esperada.index]
+    assert (esperada['ultima_fecha'] == obtenida['ultima_fecha']).all()
+    for col in ['ultimo_stock', 'suma_consumo', 'suma_dias', 'consumo_diario']:
+        assert np.allclose(esperada[col], obtenida[col], rtol=1e-9, atol=1e-9), col
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    catalogo = armar_catalogo(80)
+    catalogo.loc[len(catalogo)] = ['COD-X', 'Sin historial', 'MATERIA PRIMA', 'kg', 'Materias Primas']
+    historial = armar_historial(n, catalogo.iloc[:-1])
+    ahora = datetime(2024, 1, 1)
+
+    rng = np.random.default_rng(1)
+    atrasadas = rng.random(n) < 0.01
+    en_orden = historial[~atrasadas]
+    corte = int(len(en_orden) * 0.9)
+    limites = np.linspace(corte, len(en_orden), 21).astype(int)
+    tandas = [en_orden.iloc[a:b] for a, b in zip(limites[:-1], limites[1:])] + [historial[atrasadas]]
+
+    df = en_orden.iloc[:corte]
+    foto = construir_foto_stock(df)
+    t_incremental, actualizados = 0.0, 0
+    for tanda in tandas:
+        df = unir(df, tanda)
+        inicio = time.perf_counter()
+        foto, cambiados = actualizar_foto_stock(foto, tanda, df)
+        t_incremental += time.perf_counter() - inicio
+        actualizados += cambiados
+
+    inicio = time.perf_counter()
+    reconstruida = construir_foto_stock(df)
+    t_completa = time.perf_counter() - inicio
+    comparar_fotos(reconstruida, foto)
+
+    esperado = reporte_por_material(df, catalogo, ahora)
+    comparar(esperado, calcular_reporte_stock(df, catalogo, ahora, foto=foto))
+    print(f"{n} movimientos, {len(tandas)} sincronizaciones: foto incremental = reconstrucción = loop original")
+    print(f"reconstrucción completa: {t_completa * 1000:.1f} ms  "
+          f"actualización incremental: {t_incremental / len(tandas) * 1000:.1f} ms por tanda "
+          f"({actualizados} materiales actualizados en total)")
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ENCABEZADOS_DB
+from datos_stock import calcular_consumo_diario, calcular_reporte_stock, procesar_filas
+
+# Verifica que el motor vectorizado de reportes dé los mismos números que el loop
+# por material original, sobre un historial sintético, y compara los tiempos.
+# También pasa un historial de texto (como viene de la hoja) por procesar_filas,
+# con cantidades de cientos de toneladas, y compara contra el mismo texto leído
+# como float: los números tienen que ser idénticos, sin tolerancia.
+# Uso: python benchmarks/verificar_reporte.py [cantidad_de_movimientos]
+
+
+def armar_catalogo(n_materiales):
+    return pd.DataFrame({
+        'codigo': [f"COD-{i}" for i in range(n_materiales)],
+        'descripcion': [f"Material {i}" for i in range(n_materiales)],
+        'tipo': 'MATERIA PRIMA',
+        'unidad': 'kg',
+        'planta': 'Materias Primas',
+    })
+
+
+def armar_historial(n_filas, catalogo, semilla=0):
+    rng = np.random.default_rng(semilla)
+    # Timestamps únicos: con fechas repetidas el orden entre empates no está definido
+    segundos = rng.permutation(n_filas).astype('int64') * 37
+    return pd.DataFrame({
+        'material_codigo': rng.choice(catalogo['descripcion'].to_numpy(), n_filas),
+        'fecha_hora': pd.Timestamp('2020-01-01') + pd.to_timedelta(segundos, unit='s'),
+        'cantidad': rng.integers(0, 5000, n_filas).astype(float) / 4,
+        'planta': 'Materias Primas',
+    }).sort_values('fecha_hora', kind='mergesort')
+
+
+def armar_filas_hoja(n_filas, catalogo, semilla=1):
+    # Filas crudas con coma decimal y cantidades de hasta 1000 t, por encima de
+    # 2**17 kg (donde float32 ya no guarda los centésimos) y algunas con 3 decimales
+    rng = np.random.default_rng(semilla)
+    materiales = rng.choice(catalogo['descripcion'].to_numpy(), n_filas)
+    cantidades = [f"{c / 100:.2f}" for c in rng.integers(10_000_000, 100_000_000, n_filas)]
+    for i in range(0, n_filas, 7):
+        cantidades[i] = f"{rng.integers(0, 100_000_000) / 1000:.3f}"
+    cantidades[-1] = "240000.01"
+    fechas = pd.Timestamp('2023-01-01') + pd.to_timedelta(np.arange(n_filas) * 61, unit='s')
+    return [[m, f"{f:%Y-%m-%d %H:%M:%S}", c.replace('.', ','), 'Materias Primas']
+            for m, f, c in zip(materiales, fechas, cantidades)]
+
+
+def reporte_por_material(df_stock, catalogo, ahora):
+    # Copia del loop previo de los reportes de cada pestaña
+    reporte = []
+    for desc in catalogo['descripcion']:
+        df_hist = df_stock[df_stock['material_codigo']==desc].sort_values('fecha_hora')
+        ultimo_stock = df_hist['cantidad'].iloc[-1] if not df_hist.empty else 0
+        consumo = calcular_consumo_diario(df_hist)
+        dias_rest = ultimo_stock/consumo if consumo>0 else np.inf
+        fecha_agot = (ahora+timedelta(days=dias_rest)).strftime('%Y-%m-%d') if dias_rest!=np.inf else "Sin Consumo"
+        row_cat = catalogo[catalogo['descripcion']==desc].iloc[0]
+        reporte.append({
+            'Código': row_cat['codigo'],
+            'Descripción': desc,
+            'Planta': row_cat['planta'],
+            'Último Stock': ultimo_stock,
+            'Unidad': row_cat['unidad'],
+            'Consumo Diario Prom.': round(consumo,2),
+            'Días Restantes': dias_rest,
+            'Fecha Agotamiento': fecha_agot
+        })
+    return pd.DataFrame(reporte)
+
+
+def comparar(esperado, obtenido):
+    for col in ['Código', 'Descripción', 'Planta', 'Unidad', 'Fecha Agotamiento', 'Consumo Diario Prom.']:
+        pd.testing.assert_series_equal(esperado[col], obtenido[col], check_dtype=False)
+    # Las sumas por grupo pueden diferir en el último bit según el orden de suma
+    for col in ['Último Stock', 'Días Restantes']:
+        assert np.allclose(esperado[col].astype(float), obtenido[col].astype(float), rtol=1e-9, atol=0), col
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    catalogo = armar_catalogo(80)
+    # Un material sin movimientos, para cubrir la rama "Sin Consumo"
+    catalogo.loc[len(catalogo)] = ['COD-X', 'Sin historial', 'MATERIA PRIMA', 'kg', 'Materias Primas']
+    df_stock = armar_historial(n, catalogo.iloc[:-1])
+    ahora = datetime(2024, 1, 1)
+
+    inicio = time.perf_counter()
+    esperado = reporte_por_material(df_stock, catalogo, ahora)
+    t_loop = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    obtenido = calcular_reporte_stock(df_stock, catalogo, ahora)
+    t_motor = time.perf_counter() - inicio
+
+    comparar(esperado, obtenido)
+    print(f"{n} movimientos, {len(catalogo)} materiales: reportes equivalentes")
+    print(f"loop por material: {t_loop:.2f} s  motor vectorizado: {t_motor:.2f} s  ({t_loop / t_motor:.0f}x)")
+
+    filas = armar_filas_hoja(20_000, catalogo.iloc[:-1])
+    df_hoja = procesar_filas(ENCABEZADOS_DB[:4], filas)
+    df_texto = df_hoja.assign(cantidad=[float(f[2].replace(',', '.')) for f in filas])
+    esperado = reporte_por_material(df_texto, catalogo, ahora)
+    obtenido = calcular_reporte_stock(df_hoja, catalogo, ahora)
+    comparar(esperado, obtenido)
+    pd.testing.assert_series_equal(esperado['Último Stock'], obtenido['Último Stock'], check_dtype=False)
+    ultimo = obtenido.loc[obtenido['Descripción'] == filas[-1][0], 'Último Stock'].iloc[0]
+    assert ultimo == 240000.01, ultimo
+    print(f"Desde la hoja: {len(df_hoja)} movimientos de hasta 1000 t, mismos números que el texto (último {ultimo})")
@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+
+from instrumentacion import contar
+
+# Envoltorio del cliente gspread que respeta la cuota de la API de Sheets:
+# limita el ritmo de pedidos (token bucket), reintenta los 429/5xx con espera
+# exponencial y azar, y junta lecturas idénticas simultáneas en un solo pedido.
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# Pedidos que se pueden hacer seguidos con el balde lleno. La recarga es de
+# por_minuto - RAFAGA por minuto, así en cualquier ventana de 60 s no se pasa de
+# por_minuto (con una ráfaga igual a por_minuto se llegaba casi al doble de la cuota)
+RAFAGA = 5
+
+# Lecturas que se pueden compartir entre sesiones si se piden al mismo tiempo
+METODOS_LECTURA = {'get_all_values', 'get_values', 'get', 'batch_get', 'row_values', 'col_values', 'acell'}
+
+
+def _codigo_http(exc):
+    codigo = getattr(exc, 'code', None)
+    if codigo is None:
+        codigo = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return codigo
+
+
+class LimitadorTokens:
+    # Token bucket: `capacidad` pedidos en ráfaga y a lo sumo `por_minuto` en cualquier minuto
+    def __init__(self, por_minuto=60, capacidad=RAFAGA, reloj=time.monotonic, dormir=time.sleep):
+        self.capacidad = min(capacidad, max(1, por_minuto // 2))
+        self.tasa = max(por_minuto - self.capacidad, 1) / 60.0
+        self.tokens = float(self.capacidad)
+        self._reloj = reloj
+        self._dormir = dormir
+        self._ultimo = reloj()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        # Devuelve los segundos que hubo que esperar
+        esperado = 0.0
+        while True:
+            with self._lock:
+                ahora = self._reloj()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                # Con tolerancia: la espera para el último pedacito de token puede redondear a 0
+                if self.tokens >= 1 - 1e-9:
+                    self.tokens -= 1
+                    return esperado
+                espera = (1 - self.tokens) / self.tasa
+            self._dormir(espera)
+            esperado += espera
+
+
+class _Pendiente:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class ClienteSheetsLimitado:
+    def __init__(self, client, pedidos_por_minuto=60, max_reintentos=5,
+                 espera_base=1.0, espera_max=32.0, dormir=time.sleep, azar=random.random):
+        self.client = client
+        self.limitador = LimitadorTokens(pedidos_por_minuto, dormir=dormir)
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self._dormir = dormir
+        self._azar = azar
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self.metricas = {
+            'pedidos': 0,
+            'reintentos': 0,
+            'errores': 0,
+            'esperas_limite': 0,
+            'segundos_espera_limite': 0.0,
+            'segundos_backoff': 0.0,
+            'lecturas_coalescidas': 0,
+        }
+
+    def _sumar(self, clave, valor=1):
+        with self._lock:
+            self.metricas[clave] += valor
+
+    def ejecutar(self, funcion, *args, **kwargs):
+        intento = 0
+        while True:
+            espera = self.limitador.adquirir()
+            if espera > 0:
+                self._sumar('esperas_limite')
+                self._sumar('segundos_espera_limite', espera)
+            self._sumar('pedidos')
+            contar('pedidos_sheets')
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                if _codigo_http(e) not in CODIGOS_REINTENTABLES or intento >= self.max_reintentos:
+                    self._sumar('errores')
+                    raise
+                # Espera exponencial con azar ("equal jitter") para no reintentar todos juntos
+                tope = min(self.espera_max, self.espera_base * (2 ** intento))
+                pausa = tope / 2 + self._azar() * tope / 2
+                self._sumar('reintentos')
+                self._sumar('segundos_backoff', pausa)
+                self._dormir(pausa)
+                intento += 1
+
+    def leer_compartido(self, clave, funcion, *args, **kwargs):
+        # Si otra sesión ya está haciendo exactamente la misma lectura, esperamos su resultado
+        with self._lock:
+            pendiente = self._en_curso.get(clave)
+            propio = pendiente is None
+            if propio:
+                pendiente = _Pendiente()
+                self._en_curso[clave] = pendiente
+            else:
+                self.metricas['lecturas_coalescidas'] += 1
+
+        if not propio:
+            pendiente.evento.wait()
+            if pendiente.error is not None:
+                raise pendiente.error
+            return list(pendiente.resultado) if isinstance(pendiente.resultado, list) else pendiente.resultado
+
+        try:
+            pendiente.resultado = self.ejecutar(funcion, *args, **kwargs)
+            return pendiente.resultado
+        except Exception as e:
+            pendiente.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            pendiente.evento.set()
+
+    def open(self, nombre):
+        return _LibroLimitado(self.ejecutar(self.client.open, nombre), self)
+
+
+class _LibroLimitado:
+    def __init__(self, libro, limitado):
+        self._libro = libro
+        self._limitado = limitado
+
+    @property
+    def sheet1(self):
+        # En gspread 6, sheet1 vuelve a bajar la metadata del libro (get_worksheet ->
+        # fetch_sheet_metadata): es un pedido más, con el mismo límite y reintentos
+        return _HojaLimitada(self._limitado.ejecutar(lambda: self._libro.sheet1), self._limitado)
+
+    def __getattr__(self, nombre):
+        return getattr(self._libro, nombre)
+
+
+class _HojaLimitada:
+    def __init__(self, hoja, limitado):
+        self._hoja = hoja
+        self._limitado = limitado
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._hoja, nombre)
+        if not callable(atributo):
+            return atributo
+
+        limitado = self._limitado
+        if nombre in METODOS_LECTURA:
+            def llamada(*args, **kwargs):
+                clave = (id(self._hoja), nombre, repr(args), repr(sorted(kwargs.items())))
+                return limitado.leer_compartido(clave, atributo, *args, **kwargs)
+        else:
+            def llamada(*args, **kwargs):
+                return limitado.ejecutar(atributo, *args, **kwargs)
+        return llamada
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+
+from instrumentacion import tramo
+
+# Cola de escritura en segundo plano ("write-behind"). Los movimientos se anotan
+# primero en un journal local (JSON por línea) y recién después se envían al
+# backend en lotes desde un hilo propio, así la interfaz no espera a la red y
+# nada se pierde si el proceso se reinicia.
+#
+# Formato del journal:
+#   {"tipo": "mov", "seq": 12, "fila": [...]}   movimiento encolado
+#   {"tipo": "ok", "hasta": 12}                 todo hasta seq 12 ya está en el backend
+
+
+def _clave_fila(fila):
+    # Si el movimiento tiene id, alcanza con eso
+    if len(fila) > 4 and fila[4]:
+        return ('id', str(fila[4]))
+    # La hoja puede devolver la cantidad formateada ("1,5"); comparamos por valor
+    material, fecha, cantidad, planta = (list(fila) + [''] * 4)[:4]
+    try:
+        cantidad = float(str(cantidad).replace(',', '.'))
+    except ValueError:
+        cantidad = str(cantidad)
+    return ('fila', str(material), str(fecha), cantidad, str(planta))
+
+
+class ColaEscritura:
+    def __init__(self, backend, ruta_journal="cola_movimientos.jsonl", tam_lote=500,
+                 al_vaciar=None, pausa_error=5.0):
+        self.backend = backend
+        self.ruta_journal = ruta_journal
+        self.tam_lote = tam_lote
+        self.al_vaciar = al_vaciar
+        self.pausa_error = pausa_error
+        self._cond = threading.Condition()
+        self._pendientes = []  # [seq, fila, recuperado]
+        self._seq = 0
+        self._ids = set()  # Ids encolados por este proceso (pendientes o ya enviados)
+        self.metricas = {
+            'encolados': 0,
+            'escritos': 0,
+            'lotes': 0,
+            'recuperados': 0,
+            'duplicados_omitidos': 0,
+            'ultima_latencia': None,
+            'ultimo_envio': None,
+            'ultimo_error': None,
+        }
+        self._recuperar_journal()
+        self._hilo = threading.Thread(target=self._trabajar, name="cola-escritura", daemon=True)
+        self._hilo.start()
+
+    # --- Journal ---
+    def _recuperar_journal(self):
+        if not os.path.exists(self.ruta_journal):
+            return
+        movimientos, confirmado = [], 0
+        with open(self.ruta_journal, encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    continue  # Última línea a medio escribir por un corte
+                if registro.get('tipo') == 'mov':
+                    movimientos.append(registro)
+                elif registro.get('tipo') == 'ok':
+                    confirmado = max(confirmado, registro['hasta'])
+                self._seq = max(self._seq, registro.get('seq', 0), registro.get('hasta', 0))
+
+        # Pudieron quedar enviados sin confirmar: se revisan contra el backend antes de escribir
+        self._pendientes = [[r['seq'], r['fila'], True] for r in movimientos if r['seq'] > confirmado]
+        self._ids.update(_clave_fila(f) for _, f, _ in self._pendientes)
+        self.metricas['recuperados'] = len(self._pendientes)
+        if not self._pendientes:
+            self._compactar_journal()
+
+    def _escribir_journal(self, registros):
+        with open(self.ruta_journal, 'a', encoding='utf-8') as f:
+            for registro in registros:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compactar_journal(self):
+        open(self.ruta_journal, 'w').close()
+
+    # --- API ---
+    def encolar(self, filas):
+        with self._cond:
+            registros = []
+            for fila in filas:
+                clave = _clave_fila(fila)
+                if clave[0] == 'id' and clave in self._ids:
+                    continue  # Reenvío del mismo movimiento: ya está en la cola
+                self._ids.add(clave)
+                self._seq += 1
+                registros.append({'tipo': 'mov', 'seq': self._seq, 'fila': list(fila)})
+            # Primero al disco, después a memoria: si el proceso muere, el journal manda
+            self._escribir_journal(registros)
+            self._pendientes.extend([r['seq'], r['fila'], False] for r in registros)
+            self.metricas['encolados'] += len(registros)
+            self._cond.notify_all()
+        return len(registros)
+
+    def ids_encolados(self):
+        with self._cond:
+            return {clave[1] for clave in self._ids if clave[0] == 'id'}
+
+    @property
+    def profundidad(self):
+        with self._cond:
+            return len(self._pendientes)
+
+    def esperar_vacia(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pendientes, timeout)
+
+    # --- Hilo de envío ---
+    def _filtrar_ya_escritas(self, lote):
+        if not any(recuperado for _, _, recuperado in lote):
+            return [fila for _, fila, _ in lote]
+        # Reenvío tras un reinicio: omitimos lo que ya llegó al backend
+        _, existentes = self.backend.ultimas(max(200, 2 * len(lote)))
+        claves = {_clave_fila(f) for f in existentes}
+        filas = []
+        for _, fila, recuperado in lote:
+            if recuperado and _clave_fila(fila) in claves:
+                self.metricas['duplicados_omitidos'] += 1
+                continue
+            filas.append(fila)
+        return filas
+
+    def _trabajar(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pendientes)
+                lote = self._pendientes[:self.tam_lote]
+
+            inicio = time.perf_counter()
+            try:
+                filas = self._filtrar_ya_escritas(lote)
+                if filas:
+                    with tramo("escritura_lote", filas=len(filas), origen="cola"):
+                        self.backend.agregar_lote(filas)
+            except Exception as e:
+                self.metricas['ultimo_error'] = str(e)
+                self.backend.reiniciar()
+                time.sleep(self.pausa_error)
+                continue
+
+            with self._cond:
+                del self._pendientes[:len(lote)]
+                self._escribir_journal([{'tipo': 'ok', 'hasta': lote[-1][0]}])
+                if not self._pendientes:
+                    self._compactar_journal()
+                self.metricas['escritos'] += len(filas)
+                self.metricas['lotes'] += 1
+                self.metricas['ultima_latencia'] = time.perf_counter() - inicio
+                self.metricas['ultimo_envio'] = time.time()
+                self.metricas['ultimo_error'] = None
+                self._cond.notify_all()
+
+            if self.al_vaciar and filas:
+                self.al_vaciar()
@@ -0,0 +1,702 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import os
+import sys
+import time
+import warnings
+from datetime import datetime, timedelta
+
+from instrumentacion import tramo, contar
+from almacenamiento import NOMBRE_BASE_DATOS, COLUMNA_ID, _completar_fila, _sin_vacias_al_final
+
+# Lógica de datos del control de stock: lectura/limpieza de la hoja, sincronización
+# incremental, guardado, cálculo de consumo y reportes. Se mantiene separada de app.py para
+# poder usarla (y medirla) sin levantar la interfaz de Streamlit: los dos helpers
+# viejos que avisan en pantalla (cargar_y_procesar_datos, guardar_dato_gsheet)
+# importan streamlit recién al fallar.
+
+# --- Lectura y Limpieza ---
+# El historial se guarda compacto: material y planta como categorías, cantidad en
+# float64 y fecha_hora como datetime64. Cada columna se convierte directo desde
+# las filas crudas, sin armar antes un DataFrame de strings.
+# La cantidad no va en float32: desde 131072 kg ya no guarda los centésimos
+# (240000,01 quedaba 240000.015625) y los reportes dejan de coincidir con la hoja.
+COLUMNAS_CATEGORICAS = ['material_codigo', 'planta']
+
+def procesar_filas(headers, filas, inicio=0, stats=None):
+    # Convierte filas crudas de la hoja en un DataFrame limpio.
+    # El índice conserva la posición de cada fila en la hoja (0 = primera fila de datos),
+    # así los bloques cargados incrementalmente se pueden unir sin chocar.
+    # `stats` (opcional) recibe filas leídas/descartadas y memoria antes/después.
+    ancho = len(headers)
+    # Normalizamos columnas
+    nombres = [c.lower().strip() for c in headers]
+    required_cols_db = ['fecha_hora', 'cantidad', 'material_codigo']
+
+    if not filas or not all(col in nombres for col in required_cols_db):
+        filas = [_completar_fila(f, ancho) for f in filas]
+        return pd.DataFrame(filas, columns=nombres, index=pd.RangeIndex(inicio, inicio + len(filas)))
+
+    filas_totales = len(filas)
+    memoria_texto = _estimar_memoria_texto(filas)
+
+    # Transponemos una sola vez; sólo se rellenan las filas recortadas por la API
+    columnas = dict(zip(nombres, zip(*(f if len(f) >= ancho else _completar_fila(f, ancho) for f in filas))))
+
+    # 1. Limpieza de Fechas: ISO exacto en bloque, los formatos viejos sólo para el resto
+    conteo_fechas = {}
+    fechas = parsear_fechas(columnas['fecha_hora'], conteo_fechas)
+
+    # 2. Limpieza Cantidad
+    cantidades = pd.to_numeric(
+        pd.Series(columnas['cantidad'], dtype=object).str.replace(',', '.', regex=False),
+        errors='coerce',
+    ).to_numpy()
+
+    # 3. Eliminar nulos
+    fecha_ok = ~np.isnat(fechas.to_numpy())
+    cantidad_ok = ~np.isnan(cantidades)
+    validas = np.flatnonzero(fecha_ok & cantidad_ok)
+
+    datos = {}
+    for nombre, valores in columnas.items():
+        if nombre == 'fecha_hora':
+            datos[nombre] = fechas[validas]
+        elif nombre == 'cantidad':
+            datos[nombre] = cantidades[validas].astype('float64')
+        elif nombre in COLUMNAS_CATEGORICAS:
+            datos[nombre] = pd.Categorical(np.asarray(valores, dtype=object)[validas])
+        else:
+            datos[nombre] = np.asarray(valores, dtype=object)[validas]
+    if 'planta' not in datos:
+        datos['planta'] = pd.Categorical(['N/A'] * len(validas))
+    df_clean = pd.DataFrame(datos, index=pd.Index(validas + inicio))
+
+    filas_borradas = filas_totales - len(df_clean)
+
+    # 4. Ordenar (estable, para que el orden de carga desempate fechas iguales)
+    df_clean = df_clean.sort_values(by='fecha_hora', ascending=True, kind='mergesort')
+
+    contar('filas_leidas', filas_totales)
+    contar('filas_descartadas', filas_borradas)
+    if stats is not None:
+        stats['filas_leidas'] = stats.get('filas_leidas', 0) + filas_totales
+        stats['filas_descartadas'] = stats.get('filas_descartadas', 0) + filas_borradas
+        stats['descartes_fecha'] = stats.get('descartes_fecha', 0) + int((~fecha_ok).sum())
+        stats['descartes_cantidad'] = stats.get('descartes_cantidad', 0) + int((fecha_ok & ~cantidad_ok).sum())
+        formatos = stats.setdefault('formatos_fecha', {})
+        for formato, n in conteo_fechas.items():
+            formatos[formato] = formatos.get(formato, 0) + n
+        stats['memoria_texto'] = stats.get('memoria_texto', 0) + memoria_texto
+        stats['memoria_compacta'] = int(df_clean.memory_usage(deep=True).sum())
+    return df_clean
+
+# --- Fechas ---
+# Las filas nuevas (guardar_dato_gsheet / guardar_lote) usan siempre ISO; las viejas
+# vienen en día/mes. Primero se parsea todo con el formato ISO exacto, en bloque, y
+# sólo lo que no encaja pasa por los formatos viejos, una vez por string distinto.
+FORMATO_ISO = "%Y-%m-%d %H:%M:%S"
+FORMATOS_LEGADOS = [
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d-%m-%Y %H:%M:%S",
+    "%d-%m-%Y",
+]
+_FECHAS_LEGADAS = {}  # string -> (fecha o None, formato); compartido entre cargas
+_MAX_FECHAS_LEGADAS = 100_000
+
+def _parsear_fecha_legada(valor):
+    texto = str(valor).strip()
+    for formato in FORMATOS_LEGADOS:
+        try:
+            return datetime.strptime(texto, formato), formato
+        except ValueError:
+            pass
+    # Último recurso, la misma inferencia día/mes de antes, pero sólo para este string
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fecha = pd.to_datetime(texto, dayfirst=True)
+        if not pd.isna(fecha):
+            return fecha.to_pydatetime(), 'inferido'
+    except (ValueError, OverflowError, TypeError):
+        pass
+    return None, 'descartada'
+
+def parsear_fechas(valores, conteo=None):
+    # Devuelve un DatetimeIndex (NaT en lo que no se pudo leer).
+    # `conteo` (opcional) recibe cuántas filas se leyeron con cada formato.
+    valores = np.asarray(valores, dtype=object)
+    fechas = pd.Series(pd.to_datetime(valores, format=FORMATO_ISO, errors='coerce'))
+    pendientes = fechas.isna().to_numpy()
+    if conteo is not None:
+        conteo['ISO'] = conteo.get('ISO', 0) + int(len(valores) - pendientes.sum())
+
+    if pendientes.any():
+        restantes = pd.Series(valores[pendientes])
+        # Diccionario propio de esta carga: el caché global se puede vaciar en el medio
+        resueltos = {}
+        for valor in restantes.unique():
+            resuelto = _FECHAS_LEGADAS.get(valor)
+            if resuelto is None:
+                if len(_FECHAS_LEGADAS) >= _MAX_FECHAS_LEGADAS:
+                    _FECHAS_LEGADAS.clear()
+                resuelto = _FECHAS_LEGADAS[valor] = _parsear_fecha_legada(valor)
+            resueltos[valor] = resuelto
+        resueltas = restantes.map(lambda v: resueltos[v][0])
+        fechas.iloc[np.flatnonzero(pendientes)] = pd.to_datetime(resueltas, errors='coerce').to_numpy()
+        if conteo is not None:
+            for formato, n in restantes.map(lambda v: resueltos[v][1]).value_counts().items():
+                conteo[formato] = conteo.get(formato, 0) + int(n)
+
+    return pd.DatetimeIndex(fechas)
+
+def _estimar_memoria_texto(filas, muestra=1000):
+    # Memoria aproximada del mismo bloque como DataFrame de strings (dtype object),
+    # estimada sobre una muestra para no recorrer todo el historial
+    paso = max(1, len(filas) // muestra)
+    submuestra = filas[::paso]
+    por_fila = sum(sys.getsizeof(v) + 8 for f in submuestra for v in f) / len(submuestra)
+    return int(por_fila * len(filas))
+
+def concatenar_compacto(df_actual, df_nuevo):
+    # pd.concat convierte a object las categorías que no coinciden: las unificamos antes
+    for col in COLUMNAS_CATEGORICAS:
+        if isinstance(df_actual[col].dtype, pd.CategoricalDtype) and isinstance(df_nuevo[col].dtype, pd.CategoricalDtype):
+            nuevas = df_nuevo[col].cat.categories.difference(df_actual[col].cat.categories)
+            if len(nuevas):
+                df_actual = df_actual.assign(**{col: df_actual[col].cat.add_categories(nuevas)})
+            df_nuevo = df_nuevo.assign(**{col: df_nuevo[col].cat.set_categories(df_actual[col].cat.categories)})
+    return pd.concat([df_actual, df_nuevo])
+
+def cargar_y_procesar_datos(client):
+    # Lectura completa, sin caché (referencia y respaldo de la sincronización incremental)
+    if client is None:
+        return pd.DataFrame()
+
+    try:
+        sheet = client.open(NOMBRE_BASE_DATOS).sheet1
+        data = sheet.get_all_values()
+    except Exception as e:
+        import streamlit as st
+
+        st.warning(f"Error al leer Google Sheets: {e}")
+        return pd.DataFrame()
+
+    if not data:
+        return pd.DataFrame()
+    headers = data.pop(0)
+    return procesar_filas(headers, data)
+
+# --- Ids de Movimiento ---
+# Cada movimiento lleva un id determinístico (material, planta, cantidad y minuto).
+# Un doble clic, un reintento o un rerun después de una falla parcial generan el
+# mismo id, así que se rechazan al escribir y se descartan al leer. Sin esto,
+# los duplicados dejan intervalos de 0 días que inflan el consumo diario.
+# `origen` identifica el envío (la huella de una planilla importada, el token de
+# una fila de la grilla): si viene, reemplaza al minuto y el id no depende del
+# reloj, así que reenviar lo mismo más tarde también da el mismo id. Sin origen
+# (scripts, filas viejas) la ventana es el minuto: un reenvío que cruza el cambio
+# de minuto (10:15:59 -> 10:16:00) ya es otro movimiento.
+def generar_id_movimiento(material, planta, cantidad, fecha_hora, origen=None):
+    momento = origen if origen else f"{fecha_hora:%Y-%m-%d %H:%M}"
+    clave = f"{material}|{planta}|{float(cantidad):.4f}|{momento}"
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()[:16]
+
+def deduplicar_movimientos(df, ids_vistos):
+    # Descarta los movimientos cuyo id ya apareció (en este bloque o en cargas
+    # anteriores) y agrega los nuevos a `ids_vistos`. O(1) por fila.
+    if df.empty or 'fecha_hora' not in df.columns:
+        return df, 0
+    if COLUMNA_ID not in df.columns:
+        df[COLUMNA_ID] = ''
+    # Filas anteriores a los ids: se calcula el mismo id a partir de su contenido
+    sin_id = df[COLUMNA_ID].isna() | (df[COLUMNA_ID].astype(str) == '')
+    if sin_id.any():
+        df.loc[sin_id, COLUMNA_ID] = [
+            generar_id_movimiento(m, p, c, f)
+            for m, p, c, f in zip(df.loc[sin_id, 'material_codigo'], df.loc[sin_id, 'planta'],
+                                  df.loc[sin_id, 'cantidad'], df.loc[sin_id, 'fecha_hora'])
+        ]
+
+    conservar = []
+    for id_mov in df[COLUMNA_ID]:
+        if id_mov in ids_vistos:
+            conservar.append(False)
+        else:
+            ids_vistos.add(id_mov)
+            conservar.append(True)
+    descartadas = len(conservar) - sum(conservar)
+    if descartadas:
+        df = df[conservar]
+    return df, descartadas
+
+# --- Sincronización Incremental ---
+# La base es de sólo-agregado: traemos únicamente las filas nuevas y las unimos
+# al DataFrame ya procesado. `cache` es el contenedor compartido que arma app.py
+# y `backend` cualquier implementación de almacenamiento.BackendAlmacenamiento.
+RESYNC_COMPLETO_SEGUNDOS = 6 * 3600  # Relectura total periódica por si editan filas viejas a mano
+
+def nuevo_cache_sincronizacion(resumen_archivo=None):
+    # Contenedor mínimo para sincronizar fuera de la app (procesos sin interfaz)
+    return {"df": None, "encabezados": None, "filas_ingeridas": 0, "ultima_fila_cruda": None,
+            "resync_en": 0.0, "resyncs": 0, "filas_incrementales": 0,
+            "ids_vistos": set(), "duplicados_descartados": 0, "lectura": {},
+            "memoria_compacta": 0, "foto_stock": None, "foto_actualizados": 0,
+            "resumen_archivo": resumen_archivo}
+
+def sincronizacion_completa(backend, cache):
+    with tramo("descarga", modo="completa"):
+        headers, data = backend.cargar_todo()
+    cache["resync_en"] = time.time()
+
+    if not headers:
+        cache["encabezados"] = None
+        cache["filas_ingeridas"] = 0
+        cache["ultima_fila_cruda"] = None
+        cache["foto_stock"] = construir_foto_stock(None, cache.get("resumen_archivo"))
+        return pd.DataFrame()
+
+    cache["encabezados"] = headers
+    cache["filas_ingeridas"] = len(data)
+    cache["ultima_fila_cruda"] = _completar_fila(data[-1], len(headers)) if data else None
+    cache["ids_vistos"] = set()
+    cache["lectura"] = {}
+    with tramo("parseo", filas=len(data)):
+        df, cache["duplicados_descartados"] = deduplicar_movimientos(
+            procesar_filas(headers, data, stats=cache["lectura"]), cache["ids_vistos"]
+        )
+    cache["memoria_compacta"] = int(df.memory_usage(deep=True).sum())
+    with tramo("foto_stock", modo="completa"):
+        cache["foto_stock"] = construir_foto_stock(df, cache.get("resumen_archivo"))
+    cache["foto_actualizados"] = len(cache["foto_stock"])
+    return df
+
+def sincronizacion_incremental(backend, cache):
+    # Devuelve el DataFrame actualizado, o None si hace falta una resincronización completa
+    headers = cache["encabezados"]
+    ya_ingeridas = cache["filas_ingeridas"]
+
+    with tramo("descarga", modo="incremental"):
+        resultado = backend.cargar_desde(ya_ingeridas, cache["ultima_fila_cruda"])
+    if resultado is None:
+        return None
+    encabezado, cola = resultado
+    if _sin_vacias_al_final(encabezado) != _sin_vacias_al_final(headers):
+        return None
+
+    if not cola:
+        return cache["df"]
+
+    cola = [_completar_fila(f, len(headers)) for f in cola]
+    with tramo("parseo", filas=len(cola)):
+        df_nuevo = procesar_filas(headers, cola, inicio=ya_ingeridas, stats=cache["lectura"])
+        df_nuevo, descartadas = deduplicar_movimientos(df_nuevo, cache["ids_vistos"])
+    cache["filas_ingeridas"] = ya_ingeridas + len(cola)
+    cache["ultima_fila_cruda"] = cola[-1]
+    cache["filas_incrementales"] += len(cola)
+    cache["duplicados_descartados"] += descartadas
+
+    df_actual = cache["df"]
+    if df_nuevo.empty or 'fecha_hora' not in df_nuevo.columns:
+        return df_actual
+    if df_actual.empty:
+        cache["foto_stock"] = construir_foto_stock(df_nuevo, cache.get("resumen_archivo"))
+        cache["foto_actualizados"] = len(cache["foto_stock"])
+        return df_nuevo
+
+    df = concatenar_compacto(df_actual, df_nuevo)
+    # Lo normal es que las filas nuevas sean más recientes; sólo reordenamos si no
+    if df_nuevo['fecha_hora'].min() < df_actual['fecha_hora'].max():
+        df = df.sort_values(by='fecha_hora', ascending=True, kind='mergesort')
+    cache["memoria_compacta"] = int(df.memory_usage(deep=True).sum())
+    with tramo("foto_stock", modo="incremental"):
+        cache["foto_stock"], cache["foto_actualizados"] = actualizar_foto_stock(
+            cache["foto_stock"], df_nuevo, df, cache.get("resumen_archivo")
+        )
+    return df
+
+def sincronizar_datos(backend, cache):
+    puede_incremental = (
+        cache["df"] is not None
+        and cache["encabezados"]
+        and 'fecha_hora' in cache["df"].columns
+        and (time.time() - cache["resync_en"]) < RESYNC_COMPLETO_SEGUNDOS
+    )
+    if puede_incremental:
+        df = sincronizacion_incremental(backend, cache)
+        if df is not None:
+            return df
+        cache["resyncs"] += 1
+    return sincronizacion_completa(backend, cache)
+
+# --- Guardado ---
+def guardar_dato_gsheet(client, nuevo_dato):
+    if client is None:
+        return False
+
+    try:
+        sheet = client.open(NOMBRE_BASE_DATOS).sheet1
+        
+        # Verificar si faltan encabezados
+        if not sheet.acell('A1').value:
+            sheet.append_row(['material_codigo', 'fecha_hora', 'cantidad', 'planta'])
+            time.sleep(1)
+
+        # Sanitizar cantidad
+        cant_raw = nuevo_dato['cantidad']
+        if isinstance(cant_raw, list):
+            cant_final = float(cant_raw[0])
+        else:
+            cant_final = float(cant_raw)
+            
+        # --- CAMBIO CLAVE: FORMATO ISO (Año-Mes-Día) ---
+        # Esto evita que 10/12 se confunda con 12/10
+        fecha_iso = nuevo_dato['fecha_hora'].strftime("%Y-%m-%d %H:%M:%S")
+        
+        fila = [
+            str(nuevo_dato['material_descripcion']),
+            fecha_iso, # Usamos formato universal
+            cant_final,
+            str(nuevo_dato['planta'])
+        ]
+        
+        sheet.append_row(fila)
+        return True
+        
+    except Exception as e:
+        import streamlit as st
+
+        st.error(f"Error al guardar '{nuevo_dato['material_descripcion']}': {e}")
+        return False
+
+# --- Guardado en Lote ---
+def preparar_lote(df_editado, col_cantidad, fecha_hora=None, ids_vistos=None, origen=None):
+    # Valida y sanea todas las filas editadas en una sola pasada vectorizada.
+    # Devuelve (filas listas para la hoja, resultados por fila del editor).
+    # `ids_vistos`: ids ya registrados, para rechazar duplicados.
+    # `origen`: texto o Series (mismo índice que df_editado) para generar_id_movimiento.
+    fecha_hora = fecha_hora or datetime.now()
+    fecha_iso = fecha_hora.strftime("%Y-%m-%d %H:%M:%S")
+
+    cant_raw = df_editado[col_cantidad]
+    # El editor a veces devuelve la celda como lista (mismo caso que guardar_dato_gsheet)
+    if not pd.api.types.is_numeric_dtype(cant_raw):
+        cant_raw = cant_raw.map(lambda v: v[0] if isinstance(v, list) and v else v)
+    vacias = cant_raw.isna() | (cant_raw.astype(str).str.strip() == "")
+    cantidades = pd.to_numeric(cant_raw.where(~vacias), errors='coerce')
+    invalidas = ~vacias & cantidades.isna()
+
+    resultados = pd.DataFrame({
+        'descripcion': df_editado['descripcion'].astype(str),
+        'planta': df_editado['planta'].astype(str),
+        'cantidad': cantidades,
+        'estado': 'pendiente',
+        'detalle': '',
+    }, index=df_editado.index)
+    resultados.loc[vacias, 'estado'] = 'omitido'
+    resultados.loc[invalidas, 'estado'] = 'error'
+    resultados.loc[invalidas, 'detalle'] = "Cantidad inválida: " + cant_raw[invalidas].astype(str)
+
+    resultados[COLUMNA_ID] = ''
+    validas = resultados['estado'] == 'pendiente'
+    if isinstance(origen, pd.Series):
+        origenes = origen.reindex(resultados.index)[validas]
+    else:
+        origenes = [origen] * int(validas.sum())
+    resultados.loc[validas, COLUMNA_ID] = [
+        generar_id_movimiento(desc, planta, cant, fecha_hora, org)
+        for desc, planta, cant, org in zip(resultados.loc[validas, 'descripcion'], resultados.loc[validas, 'planta'],
+                                           resultados.loc[validas, 'cantidad'], origenes)
+    ]
+
+    # Rechazo de duplicados: ya registrados antes o repetidos dentro del mismo lote
+    ids_vistos = ids_vistos if ids_vistos is not None else set()
+    repetidos = resultados[COLUMNA_ID].where(validas).duplicated() & validas
+    duplicados = (validas & resultados[COLUMNA_ID].isin(ids_vistos)) | repetidos
+    resultados.loc[duplicados, 'estado'] = 'duplicado'
+    resultados.loc[duplicados, 'detalle'] = "Movimiento ya registrado"
+
+    validas = resultados[resultados['estado'] == 'pendiente']
+    filas = [
+        [desc, fecha_iso, float(cant), planta, id_mov]
+        for desc, cant, planta, id_mov in zip(validas['descripcion'], validas['cantidad'],
+                                              validas['planta'], validas[COLUMNA_ID])
+    ]
+    return filas, resultados
+
+def guardar_lote(backend, df_editado, col_cantidad, fecha_hora=None, ids_vistos=None, origen=None):
+    # Guarda todas las filas con cantidad en un único pedido al backend.
+    # Devuelve el resultado por fila: 'guardado', 'error', 'duplicado' u 'omitido' (sin cantidad).
+    filas, resultados = preparar_lote(df_editado, col_cantidad, fecha_hora, ids_vistos, origen)
+    pendientes = resultados['estado'] == 'pendiente'
+    if not filas:
+        return resultados
+
+    if backend is None:
+        resultados.loc[pendientes, 'estado'] = 'error'
+        resultados.loc[pendientes, 'detalle'] = "Sin conexión con el almacenamiento"
+        return resultados
+
+    try:
+        with tramo("escritura_lote", filas=len(filas), origen="directo"):
+            backend.agregar_lote(filas)
+        resultados.loc[pendientes, 'estado'] = 'guardado'
+    except Exception as e:
+        backend.reiniciar()
+        resultados.loc[pendientes, 'estado'] = 'error'
+        resultados.loc[pendientes, 'detalle'] = str(e)
+
+    return resultados
+
+def encolar_lote(cola, df_editado, col_cantidad, fecha_hora=None, ids_vistos=None, origen=None):
+    # Igual que guardar_lote, pero deja las filas en la cola de escritura en
+    # segundo plano (cola_escritura.ColaEscritura) y vuelve enseguida.
+    # También se rechazan los ids que siguen en la cola sin llegar al backend.
+    ids_vistos = set(ids_vistos or ()) | cola.ids_encolados()
+    filas, resultados = preparar_lote(df_editado, col_cantidad, fecha_hora, ids_vistos, origen)
+    pendientes = resultados['estado'] == 'pendiente'
+    if not filas:
+        return resultados
+
+    try:
+        with tramo("encolar", filas=len(filas)):
+            cola.encolar(filas)
+        resultados.loc[pendientes, 'estado'] = 'encolado'
+    except Exception as e:
+        resultados.loc[pendientes, 'estado'] = 'error'
+        resultados.loc[pendientes, 'detalle'] = str(e)
+
+    return resultados
+
+# --- Cálculo de Consumo ---
+def calcular_consumo_diario(df_historial):
+    if len(df_historial) < 2:
+        return 0
+    # Aseguramos orden cronológico para el cálculo
+    df = df_historial.sort_values('fecha_hora').copy()
+    df = df.dropna(subset=['cantidad'])
+    
+    if len(df) < 2: return 0
+    
+    df['Consumo'] = df['cantidad'].diff(-1) * -1
+    df['Dias'] = df['fecha_hora'].diff(-1).dt.total_seconds().abs() / (24 * 3600)
+    
+    df_consumo = df[df['Consumo'] > 0]
+    
+    if df_consumo.empty or df_consumo['Dias'].sum() == 0:
+        return 0
+        
+    return df_consumo['Consumo'].sum() / df_consumo['Dias'].sum()
+
+def movimientos_recientes(df_stock, descripciones, n=50):
+    # Los n movimientos más nuevos de esos materiales, del más nuevo al más viejo.
+    # El historial ya viene ordenado por fecha: se recorre desde el final en bloques
+    # crecientes hasta juntar n, sin filtrar ni ordenar todo el DataFrame.
+    if df_stock.empty or n <= 0:
+        return df_stock.iloc[0:0]
+    if not df_stock['fecha_hora'].is_monotonic_increasing:
+        df = df_stock[df_stock['material_codigo'].isin(descripciones)]
+        return df.nlargest(n, 'fecha_hora')
+
+    descripciones = set(descripciones)
+    partes, encontrados = [], 0
+    fin, bloque = len(df_stock), max(4 * n, 1000)
+    while fin > 0 and encontrados < n:
+        inicio = max(0, fin - bloque)
+        parte = df_stock.iloc[inicio:fin]
+        parte = parte[parte['material_codigo'].isin(descripciones)]
+        partes.append(parte)
+        encontrados += len(parte)
+        fin, bloque = inicio, bloque * 2
+    return pd.concat(partes[::-1]).tail(n).iloc[::-1]
+
+# --- Reporte de Stock ---
+COLUMNAS_REPORTE = ['Código', 'Descripción', 'Planta', 'Último Stock', 'Unidad',
+                    'Consumo Diario Prom.', 'Días Restantes', 'Fecha Agotamiento']
+
+def calcular_metricas_materiales(df_stock, descripciones):
+    # Último stock y consumo diario de todos los materiales en una sola pasada.
+    # Mismas reglas que calcular_consumo_diario: para cada par de movimientos
+    # consecutivos, sólo cuentan los que tienen Consumo > 0.
+    # Con descripciones=None se calculan todos los materiales del historial.
+    columnas = ['material_codigo', 'fecha_hora', 'cantidad']
+    if descripciones is None:
+        df = df_stock[columnas]
+    else:
+        df = df_stock.loc[df_stock['material_codigo'].isin(descripciones), columnas]
+    df = df.dropna(subset=['cantidad'])
+    df = df.assign(cantidad=df['cantidad'].astype('float64'))
+    if not df['fecha_hora'].is_monotonic_increasing:
+        df = df.sort_values('fecha_hora', kind='mergesort')
+
+    # groupby sin ordenar respeta el orden cronológico dentro de cada material
+    grupos = df.groupby('material_codigo', sort=False, observed=True)
+    ultimo_stock = grupos['cantidad'].last()
+    ultima_fecha = grupos['fecha_hora'].last()
+
+    consumo = grupos['cantidad'].shift(-1) - df['cantidad']
+    dias = (grupos['fecha_hora'].shift(-1) - df['fecha_hora']).dt.total_seconds().abs() / (24 * 3600)
+    con_consumo = consumo > 0
+    material = df['material_codigo'][con_consumo]
+    suma_consumo = consumo[con_consumo].groupby(material, observed=True).sum()
+    suma_dias = dias[con_consumo].groupby(material, observed=True).sum()
+
+    metricas = pd.DataFrame({'ultimo_stock': ultimo_stock})
+    metricas['suma_consumo'] = suma_consumo.reindex(metricas.index, fill_value=0.0)
+    metricas['suma_dias'] = suma_dias.reindex(metricas.index, fill_value=0.0)
+    metricas['consumo_diario'] = (metricas['suma_consumo'] / metricas['suma_dias']).where(metricas['suma_dias'] != 0, 0.0)
+    metricas['ultima_fecha'] = ultima_fecha
+    return metricas
+
+# --- Foto de Stock por Material ---
+# Tabla materializada (una fila por material) con el último stock, la fecha del
+# último movimiento y las sumas acumuladas de consumo y días. Se arma completa en
+# cada resincronización y después se actualiza sólo con los movimientos nuevos,
+# así los reportes no recorren el historial en cada rerun.
+# `resumen` (opcional) son las sumas de los movimientos ya archivados, con el
+# mismo formato (ver archivo_historial.py); se agregan para que el consumo
+# promedio no cambie al sacar historia vieja de la hoja.
+COLUMNAS_FOTO = ['ultimo_stock', 'suma_consumo', 'suma_dias', 'consumo_diario', 'ultima_fecha']
+
+def _foto_vacia():
+    foto = pd.DataFrame({
+        'ultimo_stock': pd.Series(dtype='float64'),
+        'suma_consumo': pd.Series(dtype='float64'),
+        'suma_dias': pd.Series(dtype='float64'),
+        'consumo_diario': pd.Series(dtype='float64'),
+        'ultima_fecha': pd.Series(dtype='datetime64[us]'),
+    })
+    foto.index = pd.Index([], dtype=object, name='material_codigo')
+    return foto
+
+def _con_indice_texto(metricas):
+    # Índice común (no categórico) para poder mezclar fotos de distintas cargas
+    metricas.index = pd.Index(metricas.index.astype(object), name='material_codigo')
+    return metricas[COLUMNAS_FOTO]
+
+def _sumar_resumen(metricas, resumen, agregar_faltantes=False):
+    if resumen is None or resumen.empty:
+        return metricas
+    archivado = resumen.reindex(metricas.index)
+    metricas['suma_consumo'] += archivado['suma_consumo'].fillna(0.0)
+    metricas['suma_dias'] += archivado['suma_dias'].fillna(0.0)
+    if agregar_faltantes:
+        # Materiales que sólo tienen historia archivada
+        solo_archivo = resumen.index.difference(metricas.index)
+        metricas = pd.concat([metricas, resumen.loc[solo_archivo, COLUMNAS_FOTO]])
+    metricas['consumo_diario'] = (metricas['suma_consumo'] / metricas['suma_dias']).where(metricas['suma_dias'] != 0, 0.0)
+    return metricas
+
+def construir_foto_stock(df_stock, resumen=None):
+    # Reconstrucción completa desde el historial
+    if df_stock is None or df_stock.empty or 'fecha_hora' not in df_stock.columns:
+        foto = _foto_vacia()
+    else:
+        foto = _con_indice_texto(calcular_metricas_materiales(df_stock, None))
+    return _sumar_resumen(foto, resumen, agregar_faltantes=True)
+
+def actualizar_foto_stock(foto, df_nuevo, df_stock, resumen=None):
+    # Suma a la foto los movimientos de df_nuevo (ya incluidos en df_stock).
+    # -> (foto, materiales actualizados)
+    if df_nuevo is None or df_nuevo.empty or 'fecha_hora' not in df_nuevo.columns:
+        return foto, 0
+    nuevos = df_nuevo[['material_codigo', 'fecha_hora', 'cantidad']].dropna(subset=['cantidad'])
+    if nuevos.empty:
+        return foto, 0
+    nuevos = nuevos.assign(
+        material_codigo=nuevos['material_codigo'].astype(object),
+        cantidad=nuevos['cantidad'].astype('float64'),
+    )
+
+    # Un movimiento más viejo que el último conocido cambia pares intermedios:
+    # esos materiales se recalculan desde el historial
+    primera_nueva = nuevos.groupby('material_codigo', sort=False)['fecha_hora'].min()
+    ultima_conocida = foto['ultima_fecha'].reindex(primera_nueva.index)
+    atrasados = primera_nueva.index[ultima_conocida.notna() & (primera_nueva < ultima_conocida)]
+
+    en_orden = nuevos[~nuevos['material_codigo'].isin(atrasados)]
+    partes = []
+    if not en_orden.empty:
+        # El último movimiento conocido entra como primera fila del tramo, así el
+        # par (anterior, primer nuevo) se cuenta con las mismas reglas
+        conocidos = foto.index.intersection(en_orden['material_codigo'].unique())
+        semilla = pd.DataFrame({
+            'material_codigo': conocidos.to_numpy(dtype=object),
+            'fecha_hora': foto.loc[conocidos, 'ultima_fecha'].to_numpy(),
+            'cantidad': foto.loc[conocidos, 'ultimo_stock'].to_numpy(),
+        })
+        tramo = pd.concat([semilla, en_orden], ignore_index=True).sort_values('fecha_hora', kind='mergesort')
+        delta = _con_indice_texto(calcular_metricas_materiales(tramo, None))
+        acumulado = foto[['suma_consumo', 'suma_dias']].reindex(delta.index, fill_value=0.0)
+        delta['suma_consumo'] += acumulado['suma_consumo']
+        delta['suma_dias'] += acumulado['suma_dias']
+        partes.append(delta)
+    if len(atrasados):
+        partes.append(_sumar_resumen(_con_indice_texto(calcular_metricas_materiales(df_stock, atrasados)), resumen))
+
+    actualizados = pd.concat(partes)
+    actualizados['consumo_diario'] = (actualizados['suma_consumo'] / actualizados['suma_dias']).where(actualizados['suma_dias'] != 0, 0.0)
+    foto = pd.concat([foto.drop(actualizados.index, errors='ignore'), actualizados])
+    return foto, len(actualizados)
+
+# La última foto también queda en disco: al arrancar el proceso, los reportes se
+# dibujan con ella mientras se conecta y se descarga la hoja.
+def guardar_foto_stock(foto, ruta):
+    temporal = f"{ruta}.tmp"
+    foto.to_csv(temporal, date_format="%Y-%m-%d %H:%M:%S")
+    os.replace(temporal, ruta)
+
+def leer_foto_stock(ruta):
+    # -> foto, o None si no hay una guardada (o no se puede leer)
+    try:
+        foto = pd.read_csv(ruta, index_col='material_codigo', dtype={'material_codigo': str},
+                           keep_default_na=False, na_values={c: [''] for c in COLUMNAS_FOTO})
+    except (FileNotFoundError, ValueError, pd.errors.ParserError):
+        return None
+    if list(foto.columns) != COLUMNAS_FOTO:
+        return None
+    foto['ultima_fecha'] = pd.to_datetime(foto['ultima_fecha'], format=FORMATO_ISO).astype('datetime64[us]')
+    return _con_indice_texto(foto)
+
+def calcular_reporte_stock(df_stock, catalogo, ahora=None, indice=None, foto=None):
+    # Equivalente al loop por material de los reportes, con las mismas columnas.
+    # `indice` (descripción -> fila del catálogo) evita rearmarlo en cada rerun,
+    # y con `foto` (ver construir_foto_stock) no se recorre el historial.
+    ahora = ahora or datetime.now()
+    if catalogo.empty:
+        return pd.DataFrame(columns=COLUMNAS_REPORTE)
+
+    if foto is not None:
+        metricas = foto
+    else:
+        metricas = calcular_metricas_materiales(df_stock, catalogo['descripcion'].unique())
+    # Si una descripción se repite en el catálogo, el loop usaba la primera fila
+    if indice is None:
+        indice = {r['descripcion']: r for r in catalogo.drop_duplicates('descripcion').to_dict('records')}
+
+    reporte = []
+    for desc in catalogo['descripcion']:
+        if desc in metricas.index:
+            ultimo_stock = metricas.at[desc, 'ultimo_stock']
+            consumo = metricas.at[desc, 'consumo_diario']
+        else:
+            ultimo_stock, consumo = 0, 0
+        dias_rest = ultimo_stock/consumo if consumo>0 else np.inf
+        fecha_agot = (ahora+timedelta(days=dias_rest)).strftime('%Y-%m-%d') if dias_rest!=np.inf else "Sin Consumo"
+        row_cat = indice[desc]
+        reporte.append({
+            'Código': row_cat['codigo'],
+            'Descripción': desc,
+            'Planta': row_cat['planta'],
+            'Último Stock': ultimo_stock,
+            'Unidad': row_cat['unidad'],
+            'Consumo Diario Prom.': round(consumo,2),
+            'Días Restantes': dias_rest,
+            'Fecha Agotamiento': fecha_agot
+        })
+    return pd.DataFrame(reporte, columns=COLUMNAS_REPORTE)
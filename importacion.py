@@ -0,0 +1,240 @@
+import argparse
+import csv
+import hashlib
+import io
+import itertools
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from almacenamiento import COLUMNA_ID, crear_backend_sin_interfaz, configuracion_desde_entorno
+from catalogo import CatalogoPersistente, normalizar_clave
+from datos_stock import preparar_lote, nuevo_cache_sincronizacion, sincronizar_datos
+from instrumentacion import tramo
+
+# Importación de planillas de conteo físico (.xlsx o .csv). El archivo se lee
+# fila por fila (openpyxl en modo sólo-lectura, csv en streaming), cada fila se
+# busca en el catálogo por código o por descripción (+ planta) con sus claves
+# normalizadas (armadas una vez por versión del catálogo), las cantidades pasan por la misma validación que las grillas
+# (preparar_lote) y las filas válidas se escriben en lotes grandes.
+# Con simular=True no se escribe nada: sólo queda el reporte fila por fila.
+# Los ids de movimiento salen de la huella del archivo (no de la hora): reimportar
+# la misma planilla, aunque sea horas después de un lote fallido, sólo escribe lo
+# que faltaba. Un conteo nuevo es otro archivo, así que tiene otra huella.
+#
+# Encabezados aceptados (sin importar mayúsculas ni acentos):
+#   código | descripción (o material) | planta (opcional) | cantidad (o conteo, stock)
+#
+# Uso: python importacion.py conteo.xlsx [--aplicar] [--reporte reporte.csv]
+
+TAM_LOTE_IMPORTACION = 5000
+COLUMNAS_RESULTADO = ['fila', 'codigo', 'descripcion', 'planta', 'cantidad', 'estado', 'detalle', COLUMNA_ID]
+ALIAS_ENCABEZADOS = {
+    'codigo': 'codigo', 'cod': 'codigo', 'codigo material': 'codigo',
+    'descripcion': 'descripcion', 'material': 'descripcion', 'material descripcion': 'descripcion',
+    'planta': 'planta',
+    'cantidad': 'cantidad', 'cantidad (kg)': 'cantidad', 'conteo': 'cantidad', 'stock': 'cantidad',
+}
+
+
+def _texto(valor):
+    # Excel devuelve los códigos numéricos como número: 921020.0 -> "921020"
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor if valor is not None else '').strip()
+
+
+# --- Lectura ---
+def leer_filas(origen, nombre=None):
+    # Generador de filas (tuplas de valores), sin cargar el archivo entero.
+    # `origen`: ruta o archivo binario abierto (p. ej. lo que devuelve st.file_uploader).
+    nombre = str(nombre or getattr(origen, 'name', origen))
+    if nombre.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+
+        libro = load_workbook(origen, read_only=True, data_only=True)
+        try:
+            yield from libro.active.iter_rows(values_only=True)
+        finally:
+            libro.close()
+        return
+
+    if isinstance(origen, (str, os.PathLike)):
+        texto = open(origen, encoding='utf-8-sig', newline='')
+    else:
+        texto = io.TextIOWrapper(origen, encoding='utf-8-sig', newline='')
+    with texto:
+        # Las planillas exportadas en castellano suelen venir separadas por ';'
+        primera = texto.readline()
+        separador = ';' if primera.count(';') > primera.count(',') else ','
+        yield from csv.reader(itertools.chain([primera], texto), delimiter=separador)
+
+
+def huella_archivo(origen):
+    # sha1 del contenido; con un archivo abierto se vuelve al principio para leerlo después
+    huella = hashlib.sha1()
+    if isinstance(origen, (str, os.PathLike)):
+        with open(origen, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                huella.update(bloque)
+    else:
+        origen.seek(0)
+        for bloque in iter(lambda: origen.read(1 << 20), b''):
+            huella.update(bloque)
+        origen.seek(0)
+    return huella.hexdigest()[:16]
+
+
+def _posiciones(encabezado):
+    posiciones = {}
+    for i, valor in enumerate(encabezado):
+        campo = ALIAS_ENCABEZADOS.get(normalizar_clave(valor or ''))
+        if campo and campo not in posiciones:
+            posiciones[campo] = i
+    if 'cantidad' not in posiciones or not ({'codigo', 'descripcion'} & posiciones.keys()):
+        raise ValueError("La planilla necesita una columna de cantidad y otra de código o descripción "
+                         f"(encabezados leídos: {', '.join(str(v) for v in encabezado if v)})")
+    return posiciones
+
+
+# --- Catálogo ---
+def _resolver(catalogo, codigo, descripcion, planta):
+    # -> (registro del catálogo o None, detalle del error)
+    if codigo:
+        registro = catalogo.buscar_codigo(codigo)
+        if registro is None:
+            return None, f"Código desconocido: {codigo}"
+    else:
+        candidatos = catalogo.buscar_descripcion(descripcion, planta)
+        if not candidatos:
+            return None, f"Material desconocido: {descripcion}" + (f" ({planta})" if planta else "")
+        if len(candidatos) > 1:
+            return None, f"'{descripcion}' está en varias plantas: indicá la planta o el código"
+        registro = candidatos[0]
+    if planta and normalizar_clave(planta) != normalizar_clave(registro['planta']):
+        return None, f"La planta {planta} no coincide con la del catálogo ({registro['planta']})"
+    return registro, ''
+
+
+# --- Importación ---
+def _procesar_bloque(bloque, fecha_hora, ids_vistos, origen):
+    # bloque: lista de (fila, codigo, descripcion, planta, cantidad cruda, error de catálogo)
+    df = pd.DataFrame(bloque, columns=['fila', 'codigo', 'descripcion', 'planta', 'cantidad', 'error'])
+    df = df.set_index('fila', drop=False)
+    # Misma normalización que la lectura del historial: coma decimal
+    df['cantidad'] = df['cantidad'].map(lambda v: v.strip().replace(',', '.') if isinstance(v, str) else v)
+    conocidas = df['error'] == ''
+
+    filas, resultados = preparar_lote(df[conocidas], 'cantidad', fecha_hora, ids_vistos, origen)
+    negativas = (resultados['estado'] == 'pendiente') & (resultados['cantidad'] < 0)
+    if negativas.any():
+        # Un conteo no puede ser negativo (las grillas tienen min_value=0)
+        resultados.loc[negativas, 'estado'] = 'error'
+        resultados.loc[negativas, 'detalle'] = "Cantidad negativa"
+        validos = set(resultados.loc[resultados['estado'] == 'pendiente', COLUMNA_ID])
+        filas = [f for f in filas if f[4] in validos]
+    ids_vistos.update(f[4] for f in filas)
+
+    desconocidas = df.loc[~conocidas, ['descripcion', 'planta']].assign(
+        cantidad=float('nan'), estado='error', detalle=df.loc[~conocidas, 'error'], **{COLUMNA_ID: ''})
+    resultados = pd.concat([resultados, desconocidas]).reindex(df.index)
+    resultados.insert(0, 'fila', df['fila'])
+    resultados.insert(1, 'codigo', df['codigo'])
+    return filas, resultados[COLUMNAS_RESULTADO]
+
+
+def importar_conteo(origen, catalogo, escribir=None, nombre=None, fecha_hora=None, ids_vistos=None,
+                    simular=False, tam_lote=TAM_LOTE_IMPORTACION):
+    # -> (resultados por fila del archivo, resumen)
+    # `escribir(filas)`: destino de cada lote (backend.agregar_lote o cola.encolar).
+    # Estados: 'valido' (simulación), 'importado', 'error', 'duplicado', 'omitido' (sin cantidad).
+    inicio = time.perf_counter()
+    fecha_hora = fecha_hora or datetime.now()
+    ids_vistos = set(ids_vistos or ())
+    origen_ids = f"conteo:{huella_archivo(origen)}"
+    partes, lotes, fallo = [], 0, None
+
+    def cerrar_bloque(bloque):
+        nonlocal lotes, fallo
+        filas, resultados = _procesar_bloque(bloque, fecha_hora, ids_vistos, origen_ids)
+        pendientes = resultados['estado'] == 'pendiente'
+        if simular:
+            resultados.loc[pendientes, 'estado'] = 'valido'
+        elif fallo is not None:
+            resultados.loc[pendientes, 'estado'] = 'error'
+            resultados.loc[pendientes, 'detalle'] = "No se importó: falló un lote anterior"
+        elif filas:
+            try:
+                with tramo("importacion_lote", filas=len(filas)):
+                    escribir(filas)
+                lotes += 1
+                resultados.loc[pendientes, 'estado'] = 'importado'
+            except Exception as e:
+                # Lo escrito hasta acá queda; al reimportar, los ids lo marcan como duplicado
+                fallo = str(e)
+                resultados.loc[pendientes, 'estado'] = 'error'
+                resultados.loc[pendientes, 'detalle'] = fallo
+        partes.append(resultados)
+
+    with tramo("importacion", simular=simular):
+        filas_archivo = leer_filas(origen, nombre)
+        posiciones = None
+        bloque = []
+        vistos = {}  # código -> primera fila donde aparece
+        for numero, fila in enumerate(filas_archivo, start=1):
+            if not any(v not in (None, '') for v in fila):
+                continue  # Filas vacías de la planilla
+            if posiciones is None:
+                posiciones = _posiciones(fila)
+                continue
+            valores = {campo: fila[i] if i < len(fila) else None for campo, i in posiciones.items()}
+            codigo, descripcion, planta = (_texto(valores.get(c)) for c in ('codigo', 'descripcion', 'planta'))
+            registro, error = _resolver(catalogo, codigo, descripcion, planta)
+            if registro is not None:
+                codigo, descripcion, planta = registro['codigo'], registro['descripcion'], registro['planta']
+                if codigo in vistos:
+                    # Dos conteos del mismo material: no hay forma de saber cuál vale
+                    error = f"Material repetido en la planilla (ya está en la fila {vistos[codigo]})"
+                vistos.setdefault(codigo, numero)
+            bloque.append((numero, codigo, descripcion, planta, valores['cantidad'], error))
+            if len(bloque) >= tam_lote:
+                cerrar_bloque(bloque)
+                bloque = []
+        if bloque:
+            cerrar_bloque(bloque)
+        if posiciones is None:
+            raise ValueError("La planilla está vacía")
+
+    resultados = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=COLUMNAS_RESULTADO)
+    resumen = {'filas': len(resultados), 'lotes': lotes, 'segundos': round(time.perf_counter() - inicio, 3),
+               'simulacion': simular, 'error_escritura': fallo}
+    resumen.update(resultados['estado'].value_counts().to_dict())
+    return resultados, resumen
+
+
+if __name__ == "__main__":
+    # El backend y el catálogo se eligen con las mismas variables de entorno que la app
+    parser = argparse.ArgumentParser(description="Importa una planilla de conteo físico")
+    parser.add_argument("archivo")
+    parser.add_argument("--aplicar", action="store_true", help="escribir (sin esto sólo se simula)")
+    parser.add_argument("--reporte", default=None, help="CSV con el resultado fila por fila")
+    args = parser.parse_args()
+
+    config = configuracion_desde_entorno()
+    backend = crear_backend_sin_interfaz(config)
+    catalogo = CatalogoPersistente(config.get("catalogo_ruta", "catalogo_materiales.csv")).actual()
+    # Ids ya registrados, para no importar dos veces el mismo conteo
+    cache = nuevo_cache_sincronizacion()
+    sincronizar_datos(backend, cache)
+
+    resultados, resumen = importar_conteo(args.archivo, catalogo, backend.agregar_lote,
+                                          ids_vistos=cache["ids_vistos"], simular=not args.aplicar)
+    print(", ".join(f"{clave}: {valor}" for clave, valor in resumen.items()))
+    errores = resultados[resultados['estado'] == 'error']
+    for _, fila in errores.head(20).iterrows():
+        print(f"  fila {fila['fila']}: {fila['detalle']}")
+    if args.reporte:
+        resultados.to_csv(args.reporte, index=False)
+        print(f"Reporte en {args.reporte}")
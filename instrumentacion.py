@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Mediciones livianas de los caminos calientes: tramos con duración (credenciales,
+# apertura de hoja, descarga, parseo, reportes, escrituras), contadores (pedidos
+# a Sheets, filas leídas/descartadas) y marcas dentro del rerun (primer dibujo).
+# Todo queda en memoria del proceso:
+#   - agregados por tramo (cantidad, total, máximo) y contadores acumulados,
+#   - los últimos eventos, exportables como JSON por línea,
+#   - lo del rerun en curso, por hilo (cada sesión de Streamlit corre en el suyo;
+#     lo que hace el hilo de la cola de escritura cuenta sólo en los agregados).
+#     Un hilo que trabaja para un rerun (la conexión en segundo plano) junta lo
+#     suyo con iniciar_rerun() y el rerun que lo espera lo suma con sumar_al_rerun().
+# Sin dependencias: lo usan también los módulos que no importan streamlit.
+
+
+class Instrumentacion:
+    def __init__(self, max_eventos=5000):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.eventos = deque(maxlen=max_eventos)
+        self.agregados = {}  # nombre -> {'n', 'total', 'max'}
+        self.contadores = Counter()
+        self._archivo = None
+
+    def configurar_archivo(self, ruta):
+        # Además de la memoria, cada evento se agrega a `ruta` (JSON por línea)
+        with self._lock:
+            if self._archivo is not None and self._archivo.name == ruta:
+                return
+            if self._archivo is not None:
+                self._archivo.close()
+            self._archivo = open(ruta, 'a', encoding='utf-8') if ruta else None
+
+    # --- Rerun ---
+    def iniciar_rerun(self):
+        rerun = {'inicio': time.time(), 'tramos': [], 'contadores': Counter(), 'marcas': {}}
+        self._local.rerun = rerun
+        return rerun
+
+    def rerun_actual(self):
+        return getattr(self._local, 'rerun', None)
+
+    def sumar_al_rerun(self, otro):
+        # Tramos y contadores que otro hilo midió por cuenta del rerun en curso
+        rerun = self.rerun_actual()
+        if rerun is None or otro is None:
+            return
+        rerun['tramos'].extend({**t, 'en_hilo': t['hilo']} for t in otro['tramos'])
+        rerun['contadores'].update(otro['contadores'])
+
+    # --- Registro ---
+    def _guardar(self, evento):
+        with self._lock:
+            self.eventos.append(evento)
+            if self._archivo is not None:
+                self._archivo.write(json.dumps(evento, ensure_ascii=False, default=str) + "\n")
+                self._archivo.flush()
+
+    @contextmanager
+    def tramo(self, nombre, **datos):
+        inicio = time.time()
+        t0 = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            segundos = time.perf_counter() - t0
+            evento = {'tipo': 'tramo', 'nombre': nombre, 'inicio': round(inicio, 3),
+                      'segundos': round(segundos, 6), 'hilo': threading.current_thread().name}
+            evento.update(datos)
+            if error:
+                evento['error'] = error
+            with self._lock:
+                agregado = self.agregados.setdefault(nombre, {'n': 0, 'total': 0.0, 'max': 0.0})
+                agregado['n'] += 1
+                agregado['total'] += segundos
+                agregado['max'] = max(agregado['max'], segundos)
+            rerun = self.rerun_actual()
+            if rerun is not None:
+                rerun['tramos'].append(evento)
+            self._guardar(evento)
+
+    def marca(self, nombre, **datos):
+        # Segundos desde el inicio del rerun hasta este punto (p. ej. el primer dibujo)
+        rerun = self.rerun_actual()
+        if rerun is None:
+            return
+        segundos = time.time() - rerun['inicio']
+        rerun['marcas'][nombre] = segundos
+        evento = {'tipo': 'marca', 'nombre': nombre, 'inicio': round(rerun['inicio'], 3),
+                  'segundos': round(segundos, 6), 'hilo': threading.current_thread().name}
+        evento.update(datos)
+        self._guardar(evento)
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self.contadores[nombre] += n
+        rerun = self.rerun_actual()
+        if rerun is not None:
+            rerun['contadores'][nombre] += n
+
+    # --- Exportación ---
+    def exportar_jsonl(self):
+        with self._lock:
+            eventos = list(self.eventos)
+            resumen = {'tipo': 'resumen', 'momento': round(time.time(), 3),
+                       'agregados': {k: dict(v) for k, v in self.agregados.items()},
+                       'contadores': dict(self.contadores)}
+        return "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in eventos + [resumen])
+
+
+# Una sola instancia por proceso
+INSTRUMENTACION = Instrumentacion()
+tramo = INSTRUMENTACION.tramo
+contar = INSTRUMENTACION.contar
+marca = INSTRUMENTACION.marca
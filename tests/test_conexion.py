@@ -0,0 +1,23 @@
+from almacenamiento import ConexionEnSegundoPlano
+from instrumentacion import INSTRUMENTACION, contar, tramo
+
+# La conexión corre en su propio hilo: lo que mide tiene que aparecer en el rerun
+# que la espera (una sola vez), no sólo en los acumulados del proceso.
+
+
+def test_conexion_en_segundo_plano_se_suma_al_rerun_que_la_espera():
+    def crear():
+        with tramo("abrir_hoja"):
+            contar("pedidos_sheets", 2)
+        return "backend"
+
+    rerun = INSTRUMENTACION.iniciar_rerun()
+    conexion = ConexionEnSegundoPlano(crear)
+    assert conexion.obtener(5) == "backend"
+    assert [t['nombre'] for t in rerun['tramos']] == ['abrir_hoja', 'conexion_backend']
+    assert all(t['en_hilo'] == 'conexion-backend' for t in rerun['tramos'])
+    assert rerun['contadores']['pedidos_sheets'] == 2
+
+    siguiente = INSTRUMENTACION.iniciar_rerun()
+    conexion.obtener()
+    assert not siguiente['tramos'] and not siguiente['contadores']
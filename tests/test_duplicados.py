@@ -0,0 +1,50 @@
+from almacenamiento import COLUMNA_ID, BackendGoogleSheets, BackendSQLite
+from datos_stock import guardar_lote, preparar_lote
+from benchmarks import verificar_duplicados as vd
+from benchmarks.fake_gspread import FakeClient
+
+# Reenvíos del mismo lote (doble clic, reintentos, rerun tras falla parcial):
+# las verificaciones de benchmarks/verificar_duplicados.py, para que corran con pytest.
+
+REPETICIONES = len(vd.MOMENTOS) + 1  # Todos los momentos y un reintento al día siguiente
+
+
+def test_reenvios_sqlite(tmp_path):
+    vd.verificar_backend("SQLite", BackendSQLite(str(tmp_path / "stock.db")), REPETICIONES)
+
+
+def test_reenvios_sheets():
+    vd.verificar_backend("Google Sheets (falso)", BackendGoogleSheets(FakeClient()), REPETICIONES)
+
+
+def test_reenvio_directo_sqlite_mantiene_ids_contiguos():
+    vd.verificar_reenvio_sqlite(REPETICIONES)
+
+
+def test_reenvios_cola():
+    vd.verificar_cola(REPETICIONES)
+
+
+def test_ventana_sin_origen_es_el_minuto():
+    vd.verificar_ventana_sin_origen()
+
+
+def test_lectura_descarta_copias_en_la_hoja():
+    vd.verificar_lectura(REPETICIONES)
+
+
+def test_doble_clic_en_el_cambio_de_minuto(tmp_path):
+    backend = BackendSQLite(str(tmp_path / "stock.db"))
+    ids = set()
+    for fecha in vd.MOMENTOS[:2]:  # 10:15:59 y 10:16:00
+        resultado = guardar_lote(backend, vd.lote(), 'Cantidad', fecha, ids_vistos=ids, origen=vd.origenes())
+        ids.update(resultado.loc[resultado['estado'] == 'guardado', COLUMNA_ID])
+    assert len(backend.cargar_todo()[1]) == 2
+
+
+def test_cantidad_distinta_es_otro_movimiento():
+    filas, _ = preparar_lote(vd.lote(), 'Cantidad', vd.MOMENTOS[0], origen=vd.origenes())
+    otra = vd.lote().assign(Cantidad=[1200.75, 800.0, None])
+    _, resultados = preparar_lote(otra, 'Cantidad', vd.MOMENTOS[3], ids_vistos={f[4] for f in filas},
+                                  origen=vd.origenes())
+    assert resultados['estado'].tolist() == ['pendiente', 'duplicado', 'omitido']
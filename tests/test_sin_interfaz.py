@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Los procesos sin interfaz (evaluador de alertas, archivo, importación) no
+# tienen que cargar Streamlit al importar sus módulos.
+
+
+def test_procesos_sin_interfaz_no_importan_streamlit():
+    codigo = ("import sys\n"
+              "import alertas, archivo_historial, importacion\n"
+              "print('streamlit' in sys.modules)\n")
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True, cwd=RAIZ)
+    assert salida.stdout.strip() == "False"